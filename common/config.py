@@ -7,14 +7,31 @@ This module centralizes all configurable values for the C2 system
 # Network Configuration
 SERVER_HOST = 'localhost'  # Server IP address
 SERVER_PORT = 4444          # Server listening port (common C2 port)
+LOCAL_SOCKET_PATH = None    # Unix socket for clients on the same host, e.g. '/tmp/c2_server.sock' (None = TCP only)
 
 # Protocol Configuration
 BUFFER_SIZE = 4096          # Socket receive buffer size in bytes
 LENGTH_PREFIX_SIZE = 4      # Size of length prefix in bytes (supports up to 4GB messages)
+FORMAT_TAG_SIZE = 1         # Size of payload format tag in bytes (follows the length prefix)
 MAX_MESSAGE_SIZE = 100 * 1024 * 1024  # Maximum message size: 100 MB
+MAX_REGISTRATION_SIZE = 64 * 1024     # Maximum registration message size (sent before authentication)
+MESSAGE_FORMAT = 'json'     # Payload encoding: 'json', 'msgpack', or 'auto' (msgpack for messages with binary output; needs msgpack)
+COMPRESSION_THRESHOLD = 4096  # zlib-compress payloads larger than this many bytes (0 = never)
+COMPRESSION_LEVEL = 1       # zlib level (1 = fastest, 9 = smallest)
+DECODE_OFFLOAD_SIZE = 1024 * 1024  # Server decodes received payloads this large in a worker thread (0 = never)
+
+# Socket Tuning Configuration
+TCP_NODELAY = True                      # Disable Nagle's algorithm (small command/result messages)
+TCP_QUICKACK = True                     # Acknowledge immediately instead of delaying ACKs (Linux only)
+SOCKET_BUFFER_SIZE = 0                  # Fixed SO_SNDBUF/SO_RCVBUF size in bytes (0 = OS default, autotuned)
+TCP_KEEPALIVE = True                    # Detect dead peers on idle connections
+TCP_KEEPIDLE = 60                       # Idle seconds before the first keepalive probe
+TCP_KEEPINTVL = 10                      # Seconds between keepalive probes
+TCP_KEEPCNT = 5                         # Failed probes before the connection is dropped
 
 # Command Execution Configuration
 COMMAND_TIMEOUT = 30        # Maximum time for command execution in seconds
+PERSISTENT_SHELL = True     # Run commands in one long-lived /bin/sh (POSIX only)
 
 # Connection Configuration
 CONNECTION_RETRY_DELAY = 2  # Initial delay between connection attempts in seconds
@@ -23,19 +40,30 @@ MAX_CONNECTION_RETRIES = 3  # Maximum number of connection retry attempts
 # Multi-Client Configuration (Level 3)
 MAX_CLIENTS = 50            # Maximum number of concurrent client connections
 CLIENT_TIMEOUT = 300        # Client inactivity timeout in seconds (5 minutes)
+USE_UVLOOP = True           # Run the server's event loop on uvloop when it is installed
+SERVER_WORKERS = 1          # Event loop threads accepting on SERVER_PORT (> 1 uses SO_REUSEPORT, 0 = one per CPU)
+DECODE_WORKERS = 4          # Threads shared by all event loops for decoding large payloads
+MAX_PENDING_CMDS_PER_SESSION = 128  # Commands queued for one client before the operator is refused
 
 # Logging Configuration
 LOG_DIRECTORY = 'logs'                   # Directory for log files
 LOG_FILE_PREFIX = 'c2_server'            # Prefix for log filenames
 LOG_LEVEL = 'INFO'                       # Logging level (DEBUG, INFO, WARNING, ERROR)
-LOG_FORMAT = '%(asctime)s | %(levelname)-7s | %(message)s'
+LOG_FORMAT = '%(asctime)s | %(levelname)-7s | [%(sid)s] %(message)s'
 LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'    # Timestamp format
+LOG_MAX_BYTES = 10 * 1024 * 1024         # Rotate a log file once it reaches this size (10 MB)
+LOG_BACKUP_COUNT = 5                     # Number of rotated log files to keep
+LOG_BUFFER_SIZE = 64 * 1024              # Pending log bytes per file before a forced write
 
 # TLS Configuration (Level 4)
 TLS_ENABLED = False
 # Path to the server's certificate and key
 TLS_CERTFILE = 'server.crt'
 TLS_KEYFILE = 'server.key'
+TLS_MINIMUM_VERSION = 'TLSv1_2'          # Oldest protocol version accepted (ssl.TLSVersion name)
+TLS_CIPHERS = 'ECDHE+AESGCM:!aNULL'      # TLS 1.2 cipher suites (AES-GCM, hardware accelerated)
+TLS_SESSION_TICKETS = 0                  # TLS 1.3 resumption tickets issued per handshake (0 = none; the client does not resume)
+TLS_HANDSHAKE_TIMEOUT = 10.0             # Seconds a client may take to complete the TLS handshake
 
 # Authentication Configuration (Level 4)
 AUTH_ENABLED = True                                    # Enable/disable token authentication
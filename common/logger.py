@@ -6,35 +6,266 @@ This module provides centralized logging functionality with:
 - Session-aware logging with unique session IDs
 - Configurable format and log levels
 - Automatic log directory creation
+- Asynchronous output: loggers only enqueue records; a single background
+  listener thread formats them and writes to the console and log files
 
 This is for authorized security testing and educational purposes only.
 """
 
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import threading
 from datetime import datetime
+from typing import Dict, List, Optional
 from . import config
 
 
+# Records from every logger go through one queue to one listener thread
+_log_queue: queue.Queue = queue.Queue(-1)
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_lock = threading.Lock()
+
+# Output handlers for each logger name, used by the listener to route records
+_targets: Dict[str, List[logging.Handler]] = {}
+
+# Shared console handler (all sessions print to the same terminal)
+_console_handler: Optional[logging.Handler] = None
+
+# os.writev is POSIX-only; fall back to one os.write of the joined records
+_writev = getattr(os, 'writev', None)
+
+# Maximum records per writev() call (IOV_MAX is 1024 on Linux)
+_MAX_IOV = 512
+
+# One formatter shared by every handler
+_FORMATTER = logging.Formatter(config.LOG_FORMAT, datefmt=config.LOG_DATE_FORMAT)
+
+
+class _AppendFileHandler(logging.Handler):
+    """
+    Size-rotated audit log handler writing pre-encoded records to a raw
+    O_APPEND file descriptor.
+
+    Records are formatted, encoded to UTF-8 once and kept in a pending list;
+    the listener calls drain() once the queue is empty (or the list reaches
+    LOG_BUFFER_SIZE), which writes the whole batch with a single os.writev().
+    There is no TextIOWrapper or BufferedWriter in between.
+    The file is opened on the first write.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int):
+        super().__init__()
+        self.baseFilename = os.path.abspath(filename)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._fd: Optional[int] = None
+        self._file_size = 0
+        self._pending: List[bytes] = []
+        self._pending_size = 0
+        self._last_record: Optional[logging.LogRecord] = None  # Reported if a write fails
+
+    def _open(self):
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        self._fd = os.open(self.baseFilename, flags, 0o640)
+        self._file_size = os.fstat(self._fd).st_size
+
+    def _rollover(self):
+        """Rotate <file> -> <file>.1 -> ... -> <file>.<backup_count>."""
+        os.close(self._fd)
+        self._fd = None
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.baseFilename}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.baseFilename}.{i + 1}")
+            os.replace(self.baseFilename, f"{self.baseFilename}.1")
+        else:
+            os.truncate(self.baseFilename, 0)
+        self._open()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            data = (self.format(record) + '\n').encode('utf-8', 'backslashreplace')
+        except Exception:
+            self.handleError(record)
+            return
+        self._pending.append(data)
+        self._pending_size += len(data)
+        self._last_record = record
+        if self._pending_size >= config.LOG_BUFFER_SIZE or len(self._pending) >= _MAX_IOV:
+            self.drain()
+
+    def drain(self):
+        """Write all pending records with one syscall."""
+        self.acquire()
+        try:
+            if not self._pending:
+                return
+            pending, size = self._pending, self._pending_size
+            self._pending, self._pending_size = [], 0
+
+            if self._fd is None:
+                self._open()
+            if self.max_bytes > 0 and self._file_size and self._file_size + size > self.max_bytes:
+                self._rollover()
+
+            if _writev is not None:
+                written = _writev(self._fd, pending)
+            else:
+                written = os.write(self._fd, b''.join(pending))
+            if written < size:
+                # Short write (e.g. disk nearly full) - finish the rest
+                remainder = memoryview(b''.join(pending))[written:]
+                while remainder:
+                    remainder = remainder[os.write(self._fd, remainder):]
+            self._file_size += size
+        except OSError:
+            self.handleError(self._last_record)
+        finally:
+            self.release()
+
+    def flush(self):
+        self.drain()
+
+    def close(self):
+        self.acquire()
+        try:
+            self.drain()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+        finally:
+            self.release()
+            super().close()
+
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that enqueues records as they are.
+
+    The stock prepare() formats the message (and copies the record) on the
+    calling thread so the record can be pickled; this queue never leaves
+    the process, so the %-interpolation is left to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _SessionFilter(logging.Filter):
+    """
+    Stamps each record with its session ID (`sid`), which LOG_FORMAT
+    renders as the [SESSION-ID] prefix.
+    """
+
+    def __init__(self, session_id: str):
+        super().__init__()
+        self.session_id = session_id
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.sid = self.session_id
+        return True
+
+
+class _SessionRouter(logging.Handler):
+    """
+    Listener-side handler that dispatches each record to the output handlers
+    of the logger that produced it, and flushes file buffers whenever the
+    queue runs empty.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._pending = set()
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        for handler in _targets.get(record.name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+                if isinstance(handler, _AppendFileHandler):
+                    self._pending.add(handler)
+
+        if _log_queue.empty():
+            self.drain()
+        return True
+
+    def drain(self):
+        """Flush every file handler written to since the last drain."""
+        while self._pending:
+            self._pending.pop().drain()
+
+
+def _start_listener():
+    """Start the background listener thread on first use."""
+    global _listener, _console_handler
+
+    with _listener_lock:
+        if _listener is not None:
+            return
+
+        _console_handler = logging.StreamHandler()
+        _console_handler.setFormatter(_FORMATTER)
+
+        _listener = logging.handlers.QueueListener(_log_queue, _SessionRouter())
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """
+    Stop the listener thread after it has written every queued record,
+    and close all log files.
+
+    Registered with atexit; safe to call more than once.
+    """
+    global _listener
+
+    with _listener_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+
+    for handlers in _targets.values():
+        for handler in handlers:
+            if handler is not _console_handler:
+                handler.close()
+    _targets.clear()
+
+
 def setup_logger(session_id: str, client_id: str = None) -> logging.Logger:
     """
     Setup a logger with dual output (console and file) for a specific session.
 
     Creates a logger that outputs to both the console (for real-time monitoring)
     and a file (for audit trail). The logger includes the session ID in all
-    messages for tracking.
+    messages for tracking: a filter sets record.sid, which the shared formatter
+    renders as the [SESSION-ID] prefix, so messages must not add it themselves.
+
+    Messages should use lazy %-style arguments (log.info("client %s", cid)) so
+    the string is only built for records that pass LOG_LEVEL.
+
+    The logger itself only has a QueueHandler that enqueues the unformatted
+    record, so a log call costs a queue put on the calling thread. The shared
+    listener thread interpolates and formats the record and writes it to the
+    console and to this session's (size-rotated) log file. Arguments are
+    therefore rendered later, so pass values that are not modified after
+    the call (strings, numbers).
 
     Args:
-        session_id: Unique identifier for this session (e.g., SESSION-20251024-a7f3 or MAIN)
+        session_id: Unique identifier for this session (e.g., SESSION-0019a168da548000 or MAIN)
         client_id: Optional client identifier to include in log filename for easy recognition
 
     Returns:
         logging.Logger: Configured logger instance with session context
 
     Example:
-        >>> log = setup_logger("SESSION-20251024-a7f3", "LAPTOP-ABC")
+        >>> log = setup_logger("SESSION-0019a168da548000", "LAPTOP-ABC")
         >>> log.info("Client connected")
-        2025-10-24 14:09:33 | INFO    | [SESSION-20251024-a7f3] Client connected
+        2025-10-24 14:09:33 | INFO    | [SESSION-0019a168da548000] Client connected
     """
     # Create logs directory if it doesn't exist
     os.makedirs(config.LOG_DIRECTORY, exist_ok=True)
@@ -51,12 +282,18 @@ def setup_logger(session_id: str, client_id: str = None) -> logging.Logger:
     logger_name = f'c2_server_{session_id}'
     logger = logging.getLogger(logger_name)
 
-    # Set logging level from config
+    # Set logging level from config. Handlers have no level of their own, so
+    # this is the only filter: records below LOG_LEVEL are dropped before
+    # they are queued or formatted.
     logger.setLevel(getattr(logging, config.LOG_LEVEL))
 
     # Clear any existing handlers to avoid duplicates
     # Close existing handlers first to release file handles
-    for handler in logger.handlers[:]:
+    for log_filter in logger.filters[:]:
+        logger.removeFilter(log_filter)
+    for handler in logger.handlers[:] + _targets.pop(logger_name, []):
+        if handler is _console_handler:
+            continue
         try:
             handler.close()
         except:
@@ -66,44 +303,20 @@ def setup_logger(session_id: str, client_id: str = None) -> logging.Logger:
     # Prevent propagation to root logger
     logger.propagate = False
 
-    # Create console handler (outputs to terminal)
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-
-    # Create file handler (outputs to log file)
-    file_handler = logging.FileHandler(log_path, mode='a', encoding='utf-8')
-    file_handler.setLevel(logging.INFO)
+    _start_listener()
 
-    # Create formatter with session ID prefix
-    # We'll add [SESSION-ID] prefix manually in log messages
-    formatter = logging.Formatter(
-        config.LOG_FORMAT,
-        datefmt=config.LOG_DATE_FORMAT
-    )
+    # Create file handler (outputs to log file, rotated by size)
+    file_handler = _AppendFileHandler(log_path, config.LOG_MAX_BYTES, config.LOG_BACKUP_COUNT)
+    file_handler.setFormatter(_FORMATTER)
 
-    # Set formatter for both handlers
-    console_handler.setFormatter(formatter)
-    file_handler.setFormatter(formatter)
+    # Console and file output happen on the listener thread
+    _targets[logger_name] = [_console_handler, file_handler]
+    logger.addFilter(_SessionFilter(session_id))
+    logger.addHandler(_InProcessQueueHandler(_log_queue))
 
-    # Add handlers to logger
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-
-    # Log the logger setup (without session prefix for this initial message)
-    logger.info(f"Logger initialized for session: {session_id}")
-    logger.info(f"Log file: {log_path}")
+    # Log the logger setup
+    logger.info("Logger initialized for session: %s", session_id)
+    logger.info("Log file: %s", log_path)
 
     return logger
 
-
-def create_session_prefix(session_id: str) -> str:
-    """
-    Create a standardized session prefix for log messages.
-
-    Args:
-        session_id: The session identifier
-
-    Returns:
-        str: Formatted session prefix like "[SESSION-123]"
-    """
-    return f"[{session_id}]"
@@ -1,11 +1,140 @@
+import asyncio
 import json
-import struct
+import ssl
 import socket
-from typing import Optional, Dict, Any
+import zlib
+from typing import Optional, Dict, Any, Awaitable, Callable, List, Tuple
 from . import config
 
+try:
+    import msgpack
+except ImportError:
+    # MessagePack is optional - JSON is always available
+    msgpack = None
 
-def recv_exactly(sock: socket.socket, num_bytes: int) -> Optional[bytes]:
+try:
+    import orjson
+except ImportError:
+    # orjson is optional - the stdlib json module produces the same wire format
+    orjson = None
+
+
+# Payload format tags (sent in the byte right after the length prefix)
+FORMAT_JSON = 0x00
+FORMAT_MSGPACK = 0x01
+
+# Flag bit in the format tag: payload is zlib-compressed
+FLAG_COMPRESSED = 0x80
+
+# Header layout: [4-byte length (big-endian)][1-byte format tag], packed and
+# unpacked as one 5-byte big-endian integer: (length << 8) | format_tag
+HEADER_SIZE = config.LENGTH_PREFIX_SIZE + config.FORMAT_TAG_SIZE
+
+# Zero-length frame: the wire image of an empty dict
+_EMPTY_FRAME = (bytes(HEADER_SIZE), b'')
+
+# Config values used on every message, bound once at import (module globals
+# are one dict lookup; config.X is two)
+_MAX_MESSAGE_SIZE = config.MAX_MESSAGE_SIZE
+_USE_MSGPACK = config.MESSAGE_FORMAT == 'msgpack' and msgpack is not None
+_AUTO_MSGPACK = config.MESSAGE_FORMAT == 'auto' and msgpack is not None
+_COMPRESSION_THRESHOLD = config.COMPRESSION_THRESHOLD
+_COMPRESSION_LEVEL = config.COMPRESSION_LEVEL
+
+# Default MessageReader buffer size (grows temporarily for larger frames)
+_READER_BUFFER_SIZE = 64 * 1024
+
+# MessageReader keeps a grown buffer for reuse up to this size; larger
+# buffers (for frames above it) are released once the frame is consumed
+_READER_BUFFER_MAX = 1024 * 1024
+
+# Buffers at least this large are sent on their own rather than copied
+# into a joined buffer (sendall fallback for TLS/Windows, see _send_buffers)
+_JOIN_LIMIT = 64 * 1024
+
+# Maximum buffers per sendmsg() call (stays below the usual IOV_MAX of 1024)
+_MAX_IOV = 512
+
+# MessageConnection.receive_message decodes payloads of at least this size in
+# the event loop's executor instead of on the loop thread
+_OFFLOAD_DECODE_SIZE = config.DECODE_OFFLOAD_SIZE
+
+
+def _set_option(sock: socket.socket, level: int, option: Optional[int], value: int):
+    """
+    Set a socket option, ignoring options the platform does not support.
+    """
+    if option is None:
+        return
+    try:
+        sock.setsockopt(level, option, value)
+    except OSError:
+        pass
+
+
+def set_buffer_sizes(sock: socket.socket):
+    """
+    Apply SOCKET_BUFFER_SIZE as a fixed SO_SNDBUF/SO_RCVBUF, if it is set.
+
+    By default (0) the buffers are left to the OS: Linux autotunes them
+    per connection up to net.ipv4.tcp_rmem/tcp_wmem, and a fixed size
+    turns that off. The TCP window scale is negotiated from the receive
+    buffer during the handshake, so a server must also set it on the
+    listening socket (accepted sockets inherit it); setting it after
+    accept() is too late to allow a larger window.
+
+    Args:
+        sock: A TCP socket (client before connect, or a listening socket)
+    """
+    if config.SOCKET_BUFFER_SIZE:
+        _set_option(sock, socket.SOL_SOCKET, socket.SO_SNDBUF, config.SOCKET_BUFFER_SIZE)
+        _set_option(sock, socket.SOL_SOCKET, socket.SO_RCVBUF, config.SOCKET_BUFFER_SIZE)
+
+
+def tune_socket(sock: socket.socket):
+    """
+    Apply the socket options from config to a TCP socket.
+
+    - TCP_NODELAY: small command/result messages are sent immediately
+      instead of waiting for Nagle's algorithm (avoids ~40 ms stalls)
+    - TCP_QUICKACK (Linux): the peer's first messages are acknowledged
+      right away instead of after the delayed-ACK timer. The kernel may
+      drop back to delayed ACKs later, so this mostly helps the handshake
+      and registration exchange
+    - SO_SNDBUF/SO_RCVBUF: only if SOCKET_BUFFER_SIZE is set (see
+      set_buffer_sizes)
+    - SO_KEEPALIVE (+ TCP_KEEPIDLE/INTVL/CNT where available): dead peers
+      are detected on idle connections
+
+    Call before connect() (client) or right after accept() (server), and
+    before any TLS wrapping. On the server this is the transport's socket
+    (connection.get_extra_info('socket')); asyncio does TLS in memory, so
+    the options apply to the same socket either way. Unsupported options
+    are skipped silently, and non-TCP sockets (e.g. the local Unix socket)
+    are left untouched.
+
+    Args:
+        sock: A TCP socket
+    """
+    if sock.family not in (socket.AF_INET, socket.AF_INET6):
+        return
+
+    if config.TCP_NODELAY:
+        _set_option(sock, socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    if config.TCP_QUICKACK:
+        _set_option(sock, socket.IPPROTO_TCP, getattr(socket, 'TCP_QUICKACK', None), 1)
+
+    set_buffer_sizes(sock)
+
+    if config.TCP_KEEPALIVE:
+        _set_option(sock, socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        _set_option(sock, socket.IPPROTO_TCP, getattr(socket, 'TCP_KEEPIDLE', None), config.TCP_KEEPIDLE)
+        _set_option(sock, socket.IPPROTO_TCP, getattr(socket, 'TCP_KEEPINTVL', None), config.TCP_KEEPINTVL)
+        _set_option(sock, socket.IPPROTO_TCP, getattr(socket, 'TCP_KEEPCNT', None), config.TCP_KEEPCNT)
+
+
+def recv_exactly(sock: socket.socket, num_bytes: int) -> Optional[bytearray]:
     """
     Receive exactly num_bytes from a socket.
 
@@ -13,27 +142,32 @@ def recv_exactly(sock: socket.socket, num_bytes: int) -> Optional[bytes]:
     exactly the requested number of bytes have been received. This is
     critical because sock.recv(n) may return fewer than n bytes.
 
+    The result buffer is allocated once and filled in place with
+    recv_into(), so a message split across many segments is not
+    re-copied on every iteration.
+
     Args:
         sock: The socket to receive from
         num_bytes: Exact number of bytes to receive
 
     Returns:
-        bytes: Exactly num_bytes of data
+        bytearray: Exactly num_bytes of data (usable wherever bytes are)
         None: If connection closed or error occurred
     """
-    data = b''  # Accumulator for received bytes
-
-    while len(data) < num_bytes:
-        remaining = num_bytes - len(data)
+    data = bytearray(num_bytes)
+    view = memoryview(data)
+    received = 0
+    recv_into = sock.recv_into  # Bound once, not looked up per iteration
 
+    while received < num_bytes:
         try:
-            # Try to receive the remaining bytes
-            chunk = sock.recv(remaining)
+            # Receive directly into the unfilled part of the buffer
+            count = recv_into(view[received:])
 
-            if not chunk:
+            if not count:
                 return None
 
-            data += chunk
+            received += count
 
         except socket.timeout:
             # Socket timeout - return None to signal error
@@ -45,130 +179,850 @@ def recv_exactly(sock: socket.socket, num_bytes: int) -> Optional[bytes]:
     return data
 
 
-def send_message(sock: socket.socket, message_dict: Dict[str, Any]) -> bool:
+def _json_default(value: Any) -> str:
     """
-    Send a JSON message over a socket with length-prefix protocol.
+    JSON fallback for values the json module cannot serialize.
+
+    Raw command output (bytes) is decoded as UTF-8, replacing invalid
+    sequences, so it can travel in a JSON payload. MessagePack payloads
+    keep bytes as binary and never reach this function.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', errors='replace')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def as_text(value: Any) -> str:
+    """
+    Return a received output field as text.
+
+    Command output arrives as str (JSON payloads) or bytes (MessagePack
+    payloads); bytes are decoded as UTF-8, replacing invalid sequences.
+
+    Args:
+        value: str or bytes field value from a received message
+
+    Returns:
+        str: Text representation of the value
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', errors='replace')
+    return value
+
+
+def _has_binary(message_dict: Dict[str, Any]) -> bool:
+    """Check whether any top-level value of a message is bytes."""
+    for value in message_dict.values():
+        if isinstance(value, (bytes, bytearray)):
+            return True
+    return False
+
+
+def encode_payload(message_dict: Dict[str, Any]) -> Tuple[int, bytes]:
+    """
+    Serialize a message dict using the configured payload format.
+
+    MessagePack is used when config.MESSAGE_FORMAT is 'msgpack' and the
+    msgpack package is installed; otherwise the payload is JSON. MessagePack
+    keeps bytes values as binary, so large command output is not escaped.
+    With MESSAGE_FORMAT = 'auto', messages with a bytes value (e.g. command
+    output) use MessagePack and all others use JSON.
+
+    JSON is encoded with orjson when it is installed (several times faster,
+    returns bytes directly). Messages orjson rejects, such as strings with
+    lone surrogates, are encoded with the json module instead.
+
+    Args:
+        message_dict: Python dictionary to serialize
+
+    Returns:
+        tuple: (format_tag, payload_bytes)
+    """
+    if _USE_MSGPACK or (_AUTO_MSGPACK and _has_binary(message_dict)):
+        return FORMAT_MSGPACK, msgpack.packb(message_dict, use_bin_type=True)
+
+    if orjson is not None:
+        try:
+            return FORMAT_JSON, orjson.dumps(message_dict, default=_json_default,
+                                             option=orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            pass
+
+    # Compact separators match orjson's output
+    return FORMAT_JSON, json.dumps(message_dict, default=_json_default,
+                                   separators=(',', ':')).encode('utf-8')
 
-    Protocol Steps:
-        1. Serialize dict to JSON string
-        2. Encode JSON string to UTF-8 bytes
-        3. Calculate and validate message length
-        4. Pack length as 4-byte big-endian integer
-        5. Send [length_prefix][json_bytes]
+
+def compress_payload(format_tag: int, payload: bytes) -> Tuple[int, bytes]:
+    """
+    Compress a payload with zlib if it is above config.COMPRESSION_THRESHOLD.
+
+    Command output (logs, file listings) is usually highly compressible
+    text. The compressed payload is only used when it is actually smaller.
+
+    Args:
+        format_tag: Format tag of the encoded payload
+        payload: Encoded payload bytes
+
+    Returns:
+        tuple: (format_tag, payload) - with FLAG_COMPRESSED set if compressed
+    """
+    if _COMPRESSION_THRESHOLD and len(payload) > _COMPRESSION_THRESHOLD:
+        compressed = zlib.compress(payload, _COMPRESSION_LEVEL)
+        if len(compressed) < len(payload):
+            return format_tag | FLAG_COMPRESSED, compressed
+
+    return format_tag, payload
+
+
+def _decompress(payload: bytes, max_size: int) -> bytes:
+    """
+    Decompress a zlib payload, refusing output larger than max_size.
+
+    Raises:
+        ValueError: If the data is not valid zlib or expands past the limit
+    """
+    decompressor = zlib.decompressobj()
+    try:
+        data = decompressor.decompress(payload, max_size)
+    except zlib.error as e:
+        raise ValueError(f"Invalid compressed payload: {e}")
+
+    if decompressor.unconsumed_tail or not decompressor.eof:
+        raise ValueError(f"Compressed payload is truncated or exceeds {max_size:,} bytes")
+
+    return data
+
+
+def decode_payload(format_tag: int, payload: bytes, max_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Deserialize a payload according to its format tag.
+
+    Args:
+        format_tag: FORMAT_JSON or FORMAT_MSGPACK (from the message header),
+                    optionally combined with FLAG_COMPRESSED
+        payload: Raw payload (bytes or any bytes-like object, e.g. memoryview)
+        max_size: Largest allowed decompressed size (default: config.MAX_MESSAGE_SIZE)
+
+    Returns:
+        dict: Parsed message
+
+    Raises:
+        ValueError: If the format tag is unknown, msgpack is not installed,
+                    or the compressed data is invalid
+        UnicodeDecodeError, json.JSONDecodeError: If the payload is malformed
+    """
+    if format_tag & FLAG_COMPRESSED:
+        payload = _decompress(payload, _MAX_MESSAGE_SIZE if max_size is None else max_size)
+        format_tag &= ~FLAG_COMPRESSED
+
+    if format_tag == FORMAT_JSON:
+        if orjson is not None:
+            # Parses UTF-8 bytes directly; orjson.JSONDecodeError subclasses
+            # json.JSONDecodeError, so callers catch both the same way
+            return orjson.loads(payload)
+        return json.loads(str(payload, 'utf-8'))
+
+    if format_tag == FORMAT_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Received MessagePack payload but msgpack is not installed")
+        return msgpack.unpackb(payload, raw=False)
+
+    raise ValueError(f"Unknown payload format tag: {format_tag}")
+
+
+def _send_buffers(sock: socket.socket, buffers: List[bytes]):
+    """
+    Send a sequence of buffers in as few system calls as possible.
+
+    Plain sockets use sendmsg() scatter-gather I/O, so the buffers are not
+    copied into one combined buffer; partial sends resume where the kernel
+    stopped. TLS sockets (and platforms without sendmsg, e.g. Windows)
+    fall back to sendall(): runs of small buffers are joined into one call,
+    while buffers of _JOIN_LIMIT bytes or more are sent as they are instead
+    of being copied into the joined buffer.
+
+    Args:
+        sock: The socket to send on
+        buffers: Byte buffers to send, in order
+
+    Raises:
+        OSError: On connection errors
+    """
+    if isinstance(sock, ssl.SSLSocket) or not hasattr(sock, 'sendmsg'):
+        pending = []
+        for buffer in buffers:
+            if len(buffer) < _JOIN_LIMIT:
+                pending.append(buffer)
+                continue
+            if pending:
+                sock.sendall(b''.join(pending))
+                pending = []
+            sock.sendall(buffer)
+        if pending:
+            sock.sendall(b''.join(pending))
+        return
+
+    # Empty buffers (e.g. the payload of a zero-length frame) are skipped
+    views = [memoryview(buffer) for buffer in buffers if buffer]
+    index = 0
+    sendmsg = sock.sendmsg
+
+    while index < len(views):
+        sent = sendmsg(views[index:index + _MAX_IOV])
+
+        # Skip fully sent buffers, trim a partially sent one
+        while sent:
+            size = views[index].nbytes
+            if sent >= size:
+                sent -= size
+                index += 1
+            else:
+                views[index] = views[index][sent:]
+                sent = 0
+
+
+def encode_frame(message_dict: Dict[str, Any]) -> Tuple[bytes, bytes]:
+    """
+    Encode a message into a frame header and payload.
+
+    Steps:
+        1. Serialize dict to JSON (or MessagePack, see config.MESSAGE_FORMAT)
+        2. Calculate and validate payload length
+        3. Compress large payloads (see compress_payload)
+        4. Pack length as 4-byte big-endian integer plus 1-byte format tag
 
     Validation:
         - Message must be ≤ MAX_MESSAGE_SIZE (100 MB)
         - Message must fit in 4-byte length prefix (< 4 GB)
-        - Errors are printed to console
+
+    Fast path: an empty dict is sent as a zero-length frame (decoded as
+    {} by the receiver).
+
+    Args:
+        message_dict: Python dictionary to encode
+
+    Returns:
+        tuple: (header, payload)
+
+    Raises:
+        ValueError: If the message is too large or cannot be serialized
+        TypeError: If the message contains unserializable values
+        OverflowError: If the payload does not fit the 4-byte length prefix
+    """
+    if not message_dict:
+        return _EMPTY_FRAME
+
+    return _frame_payload(*encode_payload(message_dict))
+
+
+def _frame_payload(format_tag: int, payload: bytes) -> Tuple[bytes, bytes]:
+    """
+    Validate, compress and build the header for an encoded payload
+    (steps 2-4 of encode_frame).
+    """
+    message_length = len(payload)
+
+    # Validate message size before sending
+    if message_length > _MAX_MESSAGE_SIZE:
+        raise ValueError(
+            f"Message too large to send: {message_length:,} bytes "
+            f"(max: {_MAX_MESSAGE_SIZE:,} bytes)"
+        )
+
+    # Compress large payloads (sets FLAG_COMPRESSED in the format tag)
+    format_tag, payload = compress_payload(format_tag, payload)
+    message_length = len(payload)
+
+    # Pack length as 4-byte big-endian integer followed by the format tag
+    # (raises OverflowError if the length does not fit in 4 bytes)
+    header = ((message_length << 8) | format_tag).to_bytes(HEADER_SIZE, 'big')
+
+    return header, payload
+
+
+class MessageTemplate:
+    """
+    Message envelope with fixed fields serialized once.
+
+    Messages of one kind share fields that never change (e.g.
+    {'type': 'result'}). A template serializes those fields once; encoding
+    a message then only serializes the variable fields and splices them
+    after the cached prefix. The result is byte-for-byte the JSON of the
+    combined dict, so receivers need no changes.
+
+    Messages sent as MessagePack (see encode_payload) are encoded from the
+    combined dict as usual.
+
+    Example:
+        >>> RESULT = MessageTemplate({'type': 'result'})
+        >>> header, payload = RESULT.encode_frame({'command': 'id', 'return_code': 0})
+        >>> payload
+        b'{"type":"result","command":"id","return_code":0}'
+
+    Attributes:
+        fields: The fixed fields
+    """
+
+    __slots__ = ('fields', '_prefix', '_empty')
+
+    def __init__(self, fields: Dict[str, Any]):
+        """
+        Create a template.
+
+        Args:
+            fields: Fixed fields (must be non-empty); messages encoded with
+                    the template must not repeat these keys
+        """
+        self.fields = dict(fields)
+        _, encoded = encode_payload(self.fields)
+        # '{"type":"result"}' -> '{"type":"result",'
+        self._prefix = bytes(encoded[:-1]) + b','
+        self._empty = bytes(encoded)
+
+    def encode(self, variable_fields: Dict[str, Any]) -> Tuple[int, bytes]:
+        """
+        Serialize the fixed plus variable fields.
+
+        Args:
+            variable_fields: Fields that differ per message
+
+        Returns:
+            tuple: (format_tag, payload_bytes), as from encode_payload()
+        """
+        if _USE_MSGPACK or (_AUTO_MSGPACK and _has_binary(variable_fields)):
+            return encode_payload({**self.fields, **variable_fields})
+        if not variable_fields:
+            return FORMAT_JSON, self._empty
+
+        _, encoded = encode_payload(variable_fields)
+        # Splice '{"command":...}' in after the prefix, dropping its '{'
+        return FORMAT_JSON, self._prefix + encoded[1:]
+
+    def encode_frame(self, variable_fields: Dict[str, Any]) -> Tuple[bytes, bytes]:
+        """
+        Encode a message into a frame header and payload (see encode_frame).
+
+        Raises:
+            ValueError, TypeError, OverflowError: As for encode_frame()
+        """
+        return _frame_payload(*self.encode(variable_fields))
+
+
+def send_message(sock: socket.socket, message_dict: Dict[str, Any],
+                 template: Optional[MessageTemplate] = None) -> bool:
+    """
+    Send a message over a socket with length-prefix protocol.
+
+    Protocol Steps:
+        1. Encode the message into header and payload (see encode_frame)
+        2. Send [length_prefix][format_tag][payload] in one call (see _send_buffers)
+
+    Errors are printed to console.
 
     Args:
         sock: The socket to send on
-        message_dict: Python dictionary to send
+        message_dict: Python dictionary to send (only the variable fields
+                      if a template is given)
+        template: Optional MessageTemplate supplying pre-serialized fixed fields
 
     Returns:
         bool: True if sent successfully
               False if message too large, connection error, or serialization error
     """
     try:
-        json_string = json.dumps(message_dict)
-        json_bytes = json_string.encode('utf-8')
-        message_length = len(json_bytes)
-
-        # Validate message size before sending
-        if message_length > config.MAX_MESSAGE_SIZE:
-            print(
-                f"[!] PROTOCOL ERROR: Message too large to send: {message_length:,} bytes "
-                f"(max: {config.MAX_MESSAGE_SIZE:,} bytes)"
-            )
-            return False
-
-        # Defensive check for 4-byte limit (2^32 - 1)
-        if message_length > 0xFFFFFFFF:
-            print(
-                f"[!] PROTOCOL ERROR: Message exceeds 4-byte limit: {message_length:,} bytes "
-                f"(max: 4,294,967,295 bytes)"
-            )
-            return False
-
-        # Pack length as 4-byte big-endian integer
-        length_prefix = struct.pack('!I', message_length)
+        if template is None:
+            header, payload = encode_frame(message_dict)
+        else:
+            header, payload = template.encode_frame(message_dict)
 
-        #Combine length prefix and message, then send all at once
-        full_message = length_prefix + json_bytes
-        sock.sendall(full_message)
+        # Send header and payload together (single syscall, no concatenation)
+        _send_buffers(sock, [header, payload])
 
         return True
 
     except (BrokenPipeError, ConnectionResetError, OSError):
         # Connection error during send - don't print (expected on disconnect)
         return False
-    except (TypeError, json.JSONDecodeError) as e:
-        # JSON serialization error
-        print(f"[!] PROTOCOL ERROR: JSON serialization failed: {e}")
-        return False
-    except struct.error as e:
-        # Struct packing error (e.g., message > 4 GB)
-        print(f"[!] PROTOCOL ERROR: Struct packing failed: {e}")
-        return False
-    except Exception as e:
-        # Catch-all for unexpected errors
-        print(f"[!] PROTOCOL ERROR: Unexpected error: {e}")
+    except (TypeError, ValueError, OverflowError) as e:
+        # Oversized message, JSON / MessagePack serialization error
+        # (orjson.JSONEncodeError is a TypeError), or length > 4 GB
+        print(f"[!] PROTOCOL ERROR: Cannot send message: {e}")
         return False
 
 
-def receive_message(sock: socket.socket) -> Optional[Dict[str, Any]]:
+def receive_message(sock: socket.socket, max_size: Optional[int] = None) -> Optional[Dict[str, Any]]:
     """
     Protocol Steps:
-        1. Read exactly 4 bytes (length prefix)
+        1. Read exactly 5 bytes (length prefix + format tag)
         2. Unpack length from big-endian integer
-        3. Read exactly that many bytes (JSON payload)
-        4. Decode UTF-8 bytes to string
-        5. Parse JSON string to dictionary
+        3. Reject the frame if the length exceeds max_size - before any
+           payload buffer is allocated
+        4. Read exactly that many bytes (payload)
+        5. Decode the payload as JSON or MessagePack, based on the format tag
+
+    A zero-length payload is returned as an empty dict without decoding.
 
     Args:
         sock: The socket to receive from
+        max_size: Largest payload accepted from this peer (default:
+                  config.MAX_MESSAGE_SIZE); use a small cap for messages
+                  from unauthenticated peers, e.g. registration
 
     Returns:
         dict: Parsed message as a dictionary
         None: If connection closed or error occurred
     """
     try:
-        # Read exactly LENGTH_PREFIX_SIZE bytes for the length prefix
-        length_bytes = recv_exactly(sock, config.LENGTH_PREFIX_SIZE)
-        if length_bytes is None:
+        # Read exactly HEADER_SIZE bytes for the length prefix and format tag
+        header = recv_exactly(sock, HEADER_SIZE)
+        if header is None:
             # Connection closed or error
             return None
 
-        message_length = struct.unpack('!I', length_bytes)[0]
+        header_value = int.from_bytes(header, 'big')
+        message_length = header_value >> 8
+        format_tag = header_value & 0xFF
+
+        if max_size is None:
+            max_size = _MAX_MESSAGE_SIZE
 
         # Validate message size doesn't exceed maximum
-        if message_length > config.MAX_MESSAGE_SIZE:
+        if message_length > max_size:
             print(
                 f"[!] PROTOCOL WARNING: Received oversized message: {message_length:,} bytes "
-                f"(max: {config.MAX_MESSAGE_SIZE:,} bytes). Rejecting."
+                f"(max: {max_size:,} bytes). Rejecting."
             )
             return None
 
-        # Read exactly message_length bytes (the JSON payload)
-        json_bytes = recv_exactly(sock, message_length)
-        if json_bytes is None:
+        if message_length == 0:
+            return {}
+
+        # Read exactly message_length bytes (the payload)
+        payload = recv_exactly(sock, message_length)
+        if payload is None:
             # Connection closed mid-message
             return None
 
-        # Decode UTF-8 bytes to string
-        json_string = json_bytes.decode('utf-8')
-
-        # Parse JSON string to dictionary
-        message_dict = json.loads(json_string)
+        # Parse payload to dictionary
+        message_dict = decode_payload(format_tag, payload, max_size)
 
         return message_dict
 
-    except (UnicodeDecodeError, json.JSONDecodeError):
-        # Malformed message - invalid UTF-8 or invalid JSON
+    except (UnicodeDecodeError, json.JSONDecodeError, RecursionError):
+        # Malformed message - invalid UTF-8, invalid or too deeply nested JSON
+        # (orjson.JSONDecodeError is a json.JSONDecodeError)
         return None
-    except (struct.error, ValueError):
-        # Invalid length prefix
+    except ValueError:
+        # Unknown format tag, bad compressed data, or malformed MessagePack
         return None
-    except Exception:
-        # Catch-all for unexpected errors
+
+
+def _decode_frame(format_tag: int, payload, max_size: int) -> Optional[Dict[str, Any]]:
+    """
+    Decode a received frame payload (see _ReceiveBuffer._next_frame).
+
+    Args:
+        format_tag: Format tag from the frame header
+        payload: Payload bytes or memoryview (empty for a zero-length frame)
+        max_size: Largest decompressed payload accepted
+
+    Returns:
+        dict: Parsed message ({} for a zero-length frame)
+        None: If the payload is malformed
+    """
+    if not len(payload):
+        return {}
+    try:
+        return decode_payload(format_tag, payload, max_size)
+    except (UnicodeDecodeError, json.JSONDecodeError, RecursionError):
+        # Malformed message - invalid UTF-8, invalid or too deeply nested JSON
         return None
+    except ValueError:
+        # Unknown format tag, bad compressed data, or malformed MessagePack
+        return None
+
+
+class _ReceiveBuffer:
+    """
+    Preallocated receive buffer shared by MessageReader and MessageConnection.
+
+    Received bytes are written in place at _end (recv_into() or the event
+    loop's BufferedProtocol.get_buffer()) and consumed from _start; frames
+    are parsed by _next_frame() and decoded straight from a memoryview of
+    the buffer. Subclasses only differ in how they wait for more bytes.
+
+    Attributes:
+        max_size: Largest payload accepted from this peer
+    """
+
+    __slots__ = ('max_size', '_buffer', '_view', '_start', '_end')
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = _MAX_MESSAGE_SIZE if max_size is None else max_size
+        self._buffer = bytearray(_READER_BUFFER_SIZE)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # Offset of the first unconsumed byte
+        self._end = 0    # Offset just past the last received byte
+
+    def _next_frame(self):
+        """
+        Take the next complete frame from the buffer.
+
+        Returns:
+            tuple: (format_tag, payload memoryview) of a complete frame, which
+                   is consumed; the caller releases the view once decoded
+            int: Bytes needed from the read offset to complete the next frame
+            None: If the next frame is larger than max_size
+        """
+        unread = self._end - self._start
+        if unread < HEADER_SIZE:
+            return HEADER_SIZE
+
+        header_value = int.from_bytes(self._view[self._start:self._start + HEADER_SIZE], 'big')
+        message_length = header_value >> 8
+
+        # Validate message size before the buffer is grown for it
+        if message_length > self.max_size:
+            print(
+                f"[!] PROTOCOL WARNING: Received oversized message: {message_length:,} bytes "
+                f"(max: {self.max_size:,} bytes). Rejecting."
+            )
+            return None
+
+        needed = HEADER_SIZE + message_length
+        if unread < needed:
+            return needed
+
+        payload = self._view[self._start + HEADER_SIZE:self._start + needed]
+        self._start += needed
+        return header_value & 0xFF, payload
+
+    def _reserve(self, needed: int):
+        """
+        Make room for a frame of `needed` bytes starting at the read offset.
+
+        Moves unconsumed bytes to the front of the buffer, allocating a
+        larger buffer if the frame does not fit. The buffer grows at least
+        geometrically and is kept for later frames while it is at most
+        _READER_BUFFER_MAX; a buffer above that is shrunk back to the cap.
+        """
+        unread = self._end - self._start
+        size = len(self._buffer)
+        if needed > size:
+            size = max(needed, min(size * 2, _READER_BUFFER_MAX))
+        elif size > _READER_BUFFER_MAX:
+            size = max(needed, _READER_BUFFER_MAX)
+
+        if size != len(self._buffer):
+            # Grow for a large frame, or shrink an oversized buffer
+            buffer = bytearray(size)
+            buffer[:unread] = self._view[self._start:self._end]
+            self._view.release()
+            self._buffer = buffer
+            self._view = memoryview(buffer)
+        elif unread:
+            self._buffer[:unread] = self._view[self._start:self._end]
+
+        self._start = 0
+        self._end = unread
+
+
+class MessageReader(_ReceiveBuffer):
+    """
+    Buffered, stateful message receiver for a single connection.
+
+    receive_message() reads whatever the socket has available into an
+    internal buffer and extracts complete frames from it. A small message
+    usually arrives with one recv call instead of two (header, then payload),
+    and bytes belonging to the next message are kept for the next call
+    instead of being re-read.
+
+    The receive buffer is allocated once and filled in place with
+    recv_into(); payloads are decoded straight from a memoryview of it, so
+    receiving a message allocates no intermediate bytes objects. The buffer
+    grows for frames larger than its size and is reused for later frames
+    (up to 1 MiB; bigger buffers are released after their frame).
+
+    Use one MessageReader per connection and always receive through it once
+    created - bytes already buffered are invisible to receive_message(sock).
+
+    Attributes:
+        sock: The socket to receive from
+        max_size: Largest payload accepted from this peer
+    """
+
+    __slots__ = ('sock',)
+
+    def __init__(self, sock: socket.socket, max_size: Optional[int] = None):
+        """
+        Create a reader for a connected socket.
+
+        Args:
+            sock: The socket to receive from
+            max_size: Largest payload accepted from this peer
+                      (default: config.MAX_MESSAGE_SIZE)
+        """
+        super().__init__(max_size)
+        self.sock = sock
+
+    def receive_message(self) -> Optional[Dict[str, Any]]:
+        """
+        Receive the next message from the connection.
+
+        Returns:
+            dict: Parsed message as a dictionary
+            None: If connection closed or error occurred
+        """
+        recv_into = self.sock.recv_into
+
+        try:
+            while True:
+                frame = self._next_frame()
+                if frame is None:
+                    return None
+                if not isinstance(frame, int):
+                    # Complete frame buffered - decode it in place
+                    format_tag, payload = frame
+                    try:
+                        return _decode_frame(format_tag, payload, self.max_size)
+                    finally:
+                        payload.release()
+
+                # Not enough room after the read offset - compact, grow or shrink
+                needed = frame
+                if self._start + needed > len(self._buffer) or (
+                    self._start == self._end and len(self._buffer) > _READER_BUFFER_MAX
+                ):
+                    self._reserve(needed)
+
+                received = recv_into(self._view[self._end:])
+                if not received:
+                    # Connection closed
+                    return None
+                self._end += received
+
+        except (socket.timeout, ConnectionResetError, BrokenPipeError, OSError):
+            # Connection error
+            return None
+
+
+class MessageConnection(_ReceiveBuffer, asyncio.BufferedProtocol):
+    """
+    Event-loop counterpart of MessageReader: one connection of an asyncio
+    server (loop.create_server / create_unix_server).
+
+    As a BufferedProtocol, the event loop receives straight into the
+    connection's preallocated buffer (recv_into, no bytes object per read),
+    and receive_message() decodes complete frames in place, the same way
+    MessageReader does on a blocking socket. Reading is paused while a full
+    frame (and at least the default buffer size) is waiting to be consumed,
+    so a peer cannot make the buffer grow without bound.
+
+    Once the connection is established (after the TLS handshake, if any),
+    on_connect(connection) runs as a task; it receives and sends messages
+    with the coroutines below.
+
+    Attributes:
+        max_size: Largest payload accepted from this peer
+        transport: The event loop transport (None until connected)
+        task: Task running on_connect for this connection
+    """
+
+    __slots__ = ('transport', 'task', '_on_connect', '_loop', '_needed', '_over_ssl', '_eof',
+                 '_reading_paused', '_writing_paused', '_waiter', '_drain_waiter', '_closed')
+
+    def __init__(self, on_connect: Callable[['MessageConnection'], Awaitable[Any]],
+                 max_size: Optional[int] = None):
+        """
+        Create the protocol for one accepted connection.
+
+        Args:
+            on_connect: Coroutine function run with this connection once it is made
+            max_size: Largest payload accepted from this peer
+                      (default: config.MAX_MESSAGE_SIZE)
+        """
+        super().__init__(max_size)
+        self.transport: Optional[asyncio.BaseTransport] = None
+        self.task: Optional[asyncio.Task] = None
+        self._on_connect = on_connect
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._needed = HEADER_SIZE  # Bytes from _start that complete the next frame
+        self._over_ssl = False
+        self._eof = False           # Peer finished sending (or connection lost)
+        self._reading_paused = False
+        self._writing_paused = False
+        self._waiter: Optional[asyncio.Future] = None        # receive_message() waiting for data
+        self._drain_waiter: Optional[asyncio.Future] = None  # send_message() waiting for the peer
+        self._closed: Optional[asyncio.Future] = None        # Done when the connection is lost
+
+    # -- asyncio.BufferedProtocol callbacks (called by the event loop) --
+
+    def connection_made(self, transport: asyncio.BaseTransport):
+        self.transport = transport
+        self._over_ssl = transport.get_extra_info('sslcontext') is not None
+        self._loop = asyncio.get_running_loop()
+        self._closed = self._loop.create_future()
+        self.task = self._loop.create_task(self._on_connect(self))
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        # Free space after _end; compact or grow first if the buffer is full
+        # or cannot hold the frame being received
+        if self._end == len(self._buffer) or self._start + self._needed > len(self._buffer):
+            self._reserve(max(self._needed, self._end - self._start + 1))
+        return self._view[self._end:]
+
+    def buffer_updated(self, nbytes: int):
+        self._end += nbytes
+        unread = self._end - self._start
+        if unread >= self._needed and unread >= _READER_BUFFER_SIZE and not self._reading_paused:
+            # A whole frame is waiting - stop reading until it is consumed
+            self._reading_paused = True
+            self.transport.pause_reading()
+        self._wake(self._waiter)
+
+    def eof_received(self) -> bool:
+        self._eof = True
+        self._wake(self._waiter)
+        # Keep a half-closed TCP connection open so a reply can still be
+        # sent (TLS transports close on EOF regardless)
+        return not self._over_ssl
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self._eof = True
+        if not self._closed.done():
+            self._closed.set_result(None)
+        self._wake(self._waiter)
+        self._wake(self._drain_waiter)
+
+    def pause_writing(self):
+        self._writing_paused = True
+
+    def resume_writing(self):
+        self._writing_paused = False
+        self._wake(self._drain_waiter)
+
+    @staticmethod
+    def _wake(waiter: Optional[asyncio.Future]):
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    # -- API used by the connection's task --
+
+    def get_extra_info(self, name: str, default: Any = None) -> Any:
+        """Return transport information (peername, sockname, socket, ssl_object, ...)."""
+        return self.transport.get_extra_info(name, default)
+
+    def close(self):
+        """Close the connection (buffered outgoing data is still sent)."""
+        self.transport.close()
+
+    async def wait_closed(self):
+        """Wait until the connection is closed."""
+        await self._closed
+
+    async def receive_message(self) -> Optional[Dict[str, Any]]:
+        """
+        Receive the next message from the connection.
+
+        Payloads of DECODE_OFFLOAD_SIZE bytes or more are decoded in the
+        loop's default executor (a worker thread), so one large result does
+        not stall every other connection on the loop.
+
+        Returns:
+            dict: Parsed message as a dictionary
+            None: If connection closed or error occurred
+        """
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                return None
+            if not isinstance(frame, int):
+                self._needed = HEADER_SIZE
+                format_tag, payload = frame
+                if _OFFLOAD_DECODE_SIZE and len(payload) >= _OFFLOAD_DECODE_SIZE:
+                    # The buffer keeps filling while the executor decodes,
+                    # so hand it a copy
+                    data = bytes(payload)
+                    payload.release()
+                    return await self._loop.run_in_executor(
+                        None, _decode_frame, format_tag, data, self.max_size
+                    )
+                # Decode in place
+                try:
+                    return _decode_frame(format_tag, payload, self.max_size)
+                finally:
+                    payload.release()
+
+            if self._eof or self.transport.is_closing():
+                # Connection closed
+                return None
+
+            # Wait for the event loop to receive more bytes
+            self._needed = frame
+            if self._reading_paused:
+                self._reading_paused = False
+                self.transport.resume_reading()
+            self._waiter = self._loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+
+    async def send_message(self, message_dict: Dict[str, Any],
+                           template: Optional[MessageTemplate] = None) -> bool:
+        """
+        Send a message on the connection.
+
+        Header and payload are handed to the transport together; the call
+        only waits if the transport's write buffer is above its high-water
+        mark (the peer is not keeping up).
+
+        Args:
+            message_dict: Python dictionary to send (without the template's
+                          fields, if a template is given)
+            template: Optional MessageTemplate supplying pre-serialized fixed fields
+
+        Returns:
+            bool: True if sent successfully
+                  False if message too large, connection closed, or serialization error
+        """
+        try:
+            if template is None:
+                header, payload = encode_frame(message_dict)
+            else:
+                header, payload = template.encode_frame(message_dict)
+        except (TypeError, ValueError, OverflowError) as e:
+            print(f"[!] PROTOCOL ERROR: Cannot send message: {e}")
+            return False
+
+        return await self.send_frame(header, payload)
+
+    async def send_frame(self, header: bytes, payload: bytes) -> bool:
+        """
+        Send an already encoded frame (see encode_frame) on the connection.
+
+        Lets callers reuse the encoding of messages they send repeatedly.
+        Waits like send_message if the peer is not keeping up.
+
+        Args:
+            header: Frame header from encode_frame
+            payload: Frame payload from encode_frame
+
+        Returns:
+            bool: True if sent successfully
+                  False if the connection is closed
+        """
+        if self.transport.is_closing():
+            return False
+        self.transport.writelines((header, payload))
+
+        if self._writing_paused:
+            self._drain_waiter = self._loop.create_future()
+            try:
+                await self._drain_waiter
+            finally:
+                self._drain_waiter = None
+            if self._closed.done():
+                return False
+        return True
@@ -9,12 +9,20 @@ This module implements the command and control server that:
 - Supports multiple concurrent clients (Level 3)
 """
 
+import asyncio
+import atexit
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import os
+import queue
+import selectors
+import signal
 import socket
 import sys
-import uuid
 import logging
 import threading
-import queue
 import time
 from datetime import datetime
 from typing import Optional, Dict
@@ -23,183 +31,567 @@ from server.session import ClientSession
 from server.session_manager import SessionManager
 import ssl
 
-# Global lock for thread-safe printing (prevents interleaved output)
-print_lock = threading.Lock()
+try:
+    import uvloop
+except ImportError:
+    # uvloop is optional - the stdlib asyncio event loop runs the same code
+    uvloop = None
+
+# Console output, written to stdout by one background thread (see console_print)
+_console_queue: queue.SimpleQueue = queue.SimpleQueue()
+_console_thread: Optional[threading.Thread] = None
+
+# Most queued console text joined into a single write() call
+_CONSOLE_BATCH_SIZE = 64 * 1024
+
+# Separator line around each displayed result
+_SEP = "-" * 60
+
+# Operator prompt when no session is selected
+_PROMPT = "C2> "
+
+# Output of the 'help' command
+_HELP_TEXT = "\n".join([
+    "",
+    "Available Commands:",
+    "  sessions             - List all active client sessions",
+    "  use <session_id>     - Switch to a specific session (e.g., 'use SESSION-0019a168da548000')",
+    "  help                 - Show this help message",
+    "  exit, quit           - Close all connections and exit server",
+    "",
+    "When a session is selected (using 'use <session_id>'):",
+    "  Any other input will be sent as a shell command to that client",
+    "",
+])
+
+# Command message envelope, serialized once (see _encode_command)
+_COMMAND_TEMPLATE = protocol.MessageTemplate({'type': 'command'})
+
+# Encoded command frames kept for commands the operator repeats
+_COMMAND_CACHE_SIZE = 512
+
+# Queued in place of a command to make a session's handler exit (see stop_servers)
+_SHUTDOWN = object()
+
+# Seconds busy handlers get at shutdown to receive an in-flight result
+_SHUTDOWN_GRACE = 1.0
+
+# Session ID sequence, seeded with the start time in milliseconds (shifted
+# left 12 bits) so IDs stay unique across server restarts
+_session_counter = itertools.count(int(time.time() * 1000) << 12)
+
+
+def console_print(*values, sep: str = ' ', end: str = '\n'):
+    """
+    print() replacement for all server console output.
+
+    Only formats the text and queues it; the ConsoleWriter thread joins
+    everything queued since its last write (up to 64 KB) into one
+    stdout write. Event loop threads never block on a slow terminal, and
+    a result display costs one write instead of one per line. Output
+    keeps its queue order; pass a multi-line block as one string to keep
+    it together.
+
+    Args:
+        values: Objects to print (converted with str())
+        sep: Separator between values
+        end: Appended after the last value
+    """
+    _console_queue.put(sep.join(map(str, values)) + end)
+
+
+def _console_writer():
+    """
+    Write queued console text in batches (runs on the ConsoleWriter thread).
+
+    Stops at the None sentinel queued by stop_console_writer, after writing
+    everything queued before it.
+    """
+    stream = sys.stdout
+    running = True
+    while running:
+        text = _console_queue.get()
+        if text is None:
+            break
+
+        batch = [text]
+        size = len(text)
+        while size < _CONSOLE_BATCH_SIZE:
+            try:
+                text = _console_queue.get_nowait()
+            except queue.Empty:
+                break
+            if text is None:
+                running = False
+                break
+            batch.append(text)
+            size += len(text)
+
+        try:
+            stream.write(''.join(batch))
+            stream.flush()
+        except (OSError, ValueError):
+            pass  # Console closed
+
+
+def start_console_writer():
+    """Start the ConsoleWriter thread (text queued earlier is written first)."""
+    global _console_thread
+
+    if _console_thread is None:
+        _console_thread = threading.Thread(target=_console_writer, daemon=True, name="ConsoleWriter")
+        _console_thread.start()
+        atexit.register(stop_console_writer)
+
+
+def stop_console_writer():
+    """
+    Write all queued console output and stop the ConsoleWriter thread.
+
+    Registered with atexit; safe to call more than once.
+    """
+    global _console_thread
+
+    if _console_thread is not None:
+        _console_queue.put(None)
+        _console_thread.join(timeout=5.0)
+        _console_thread = None
+
+
+@functools.lru_cache(maxsize=_COMMAND_CACHE_SIZE)
+def _encode_command(command: str) -> tuple:
+    """
+    Encode a command message into a frame.
+
+    Scripted operators often send the same commands over and over (e.g.
+    polling with 'whoami'); the frame of each recent command is cached, so
+    a repeat costs a dictionary lookup instead of serializing it again.
+
+    Args:
+        command: Shell command to send
+
+    Returns:
+        tuple: (header, payload), as from protocol.encode_frame()
+
+    Raises:
+        ValueError, TypeError, OverflowError: As for protocol.encode_frame()
+    """
+    return _COMMAND_TEMPLATE.encode_frame({'command': command})
 
 
 def generate_session_id() -> str:
     """
     Generate a unique session ID for tracking client sessions.
 
-    Format: SESSION-{timestamp}-{random_suffix}
-    Example: SESSION-20251024140933-a7f3
+    IDs come from a counter (no clock formatting or random source per
+    connection); itertools.count is safe to share between event loop
+    threads. IDs are increasing, so they sort in connection order.
+
+    Format: SESSION-{counter as 16 hex digits}
+    Example: SESSION-0019a168da548000
 
     Returns:
         str: Unique session identifier
     """
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    random_suffix = uuid.uuid4().hex[:4]
-    return f"SESSION-{timestamp}-{random_suffix}"
+    return f"SESSION-{next(_session_counter):016x}"
+
+
+def format_client_timestamp(timestamp) -> str:
+    """
+    Format a timestamp sent by a client for display and logging.
+
+    Clients send Unix epoch seconds; older clients sent ISO-8601 strings,
+    which are returned unchanged.
+
+    Args:
+        timestamp: Epoch seconds (int/float), a string, or None
+
+    Returns:
+        str: Human-readable local time, or 'unknown'
+    """
+    if isinstance(timestamp, (int, float)):
+        return datetime.fromtimestamp(timestamp).isoformat(sep=' ', timespec='milliseconds')
+    if timestamp is None:
+        return 'unknown'
+    return str(timestamp)
 
 
 def display_banner():
     """
     Display the server startup banner with configuration info.
     """
-    print("=" * 60)
-    print("C2 SERVER - Command and Control System")
-    print("=" * 60)
-    print(f"Listening on: {config.SERVER_HOST}:{config.SERVER_PORT}")
-    print(f"Started at: {datetime.now().strftime(config.LOG_DATE_FORMAT)}")
-    print("=" * 60)
-    print()
+    console_print(
+        f"{'=' * 60}\n"
+        "C2 SERVER - Command and Control System\n"
+        f"{'=' * 60}\n"
+        f"Listening on: {config.SERVER_HOST}:{config.SERVER_PORT}\n"
+        f"Started at: {datetime.now().strftime(config.LOG_DATE_FORMAT)}\n"
+        f"{'=' * 60}\n"
+    )
 
 
-def connection_listener(
-    server_socket: socket.socket,
-    session_manager: SessionManager,
-    main_logger: logging.Logger,
-    shutdown_event: threading.Event,
-    ssl_context: Optional[ssl.SSLContext]
-    
-):
+def _peer_address(connection: protocol.MessageConnection) -> tuple:
     """
-    Accept incoming client connections and spawn handler threads.
+    Get a displayable (host, port) pair for a connection.
 
-    This function runs in a dedicated listener thread and continuously
-    accepts new client connections. For each connection, it spawns a
-    new client_handler thread to manage that client.
+    Unix socket peers have no address, so they are labelled with the
+    socket path and the connection's file descriptor instead.
 
-    The listener respects the MAX_CLIENTS configuration limit and will
-    reject connections if the limit is reached.
+    Args:
+        connection: The accepted connection
+
+    Returns:
+        tuple: (ip_address, port) or (socket_path, fd)
+    """
+    client_address = connection.get_extra_info('peername')
+    if isinstance(client_address, tuple):
+        return client_address[:2]
+    return (connection.get_extra_info('sockname'), connection.get_extra_info('socket').fileno())
+
+
+def _connection_factory(session_manager: SessionManager, main_logger: logging.Logger):
+    """
+    Build the protocol factory for accepted connections (see _Listener).
+
+    Each accepted connection gets a MessageConnection that runs handle_client
+    once it is established. Its size cap starts at MAX_REGISTRATION_SIZE and
+    is raised by handle_client after the peer registers.
 
     Args:
-        server_socket: The listening server socket
         session_manager: Shared SessionManager for all sessions
         main_logger: Logger for server-level events
-        shutdown_event: Event to signal shutdown
 
     Returns:
-        None (runs until shutdown_event is set)
+        Callable returning a new MessageConnection
     """
-    with print_lock:
-        main_logger.info("[MAIN] Connection listener thread started")
-        print("[*] Connection listener started")
-        print("[*] Waiting for client connections...")
-        print()
+    on_connect = functools.partial(handle_client, session_manager=session_manager, main_logger=main_logger)
+    return lambda: protocol.MessageConnection(on_connect, max_size=config.MAX_REGISTRATION_SIZE)
 
-    # Set socket timeout for responsive shutdown checking
-    server_socket.settimeout(1.0)
 
-    while not shutdown_event.is_set():
-        try:
-            # Check if we've reached max clients
-            current_clients = session_manager.get_session_count()
-            if current_clients >= config.MAX_CLIENTS:
-                # At capacity: avoid busy-spin by sleeping briefly
-                time.sleep(0.1)
-                continue
+class _ClientSlots:
+    """
+    Count of open client connections, shared by every accept loop.
+
+    Accept loops call wait_free() before accept(), which waits while
+    MAX_CLIENTS connections are open without taking a slot, so idle
+    listeners hold none and further clients wait in the kernel's listen
+    backlog until a slot frees up. The slot is taken by acquire() once a
+    connection has been accepted. release() wakes the waiting accept
+    loops, which may run on other event loop threads.
+    """
 
-            # Try to accept a connection (will timeout after 1 second)
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._count = 0
+        self._lock = threading.Lock()
+        self._waiters: list = []  # Futures of accept loops waiting for a slot
+
+    def full(self) -> bool:
+        """True if no slot is free."""
+        return self._count >= self._limit
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free; return whether it was taken."""
+        with self._lock:
+            if self._count < self._limit:
+                self._count += 1
+                return True
+            return False
+
+    async def wait_free(self):
+        """Wait until a slot is free, without taking it."""
+        while True:
+            with self._lock:
+                if self._count < self._limit:
+                    return
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+            await waiter
+
+    async def acquire(self):
+        """Take a slot, waiting for one if all are in use."""
+        while not self.try_acquire():
+            await self.wait_free()
+
+    def release(self):
+        """Give a slot back (the connection has closed)."""
+        with self._lock:
+            self._count -= 1
+            waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
             try:
-                client_socket, client_address = server_socket.accept()
-            except socket.timeout:
-                # No connection received, loop again
-                continue
-            # Handle TLS wrapping if enabled
-            if ssl_context:
-                raw_socket = client_socket  # Preserve reference to original socket
-                try:
-                    # Wrap the raw socket in an SSL socket
-                    client_socket = ssl_context.wrap_socket(raw_socket, server_side=True)
-                    main_logger.info(f"[MAIN] TLS handshake successful for {client_address[0]}:{client_address[1]}")
-                except ssl.SSLError as e:
-                    main_logger.error(f"[MAIN] TLS handshake failed for {client_address[0]}:{client_address[1]}: {e}")
-                    # Close the original socket properly to prevent resource leak
-                    try:
-                        raw_socket.shutdown(socket.SHUT_RDWR)
-                    except:
-                        pass
-                    raw_socket.close()
-                    continue
+                waiter.get_loop().call_soon_threadsafe(_wake_waiter, waiter)
+            except RuntimeError:
+                pass  # That loop is already closed (shutdown)
 
-            # Log the new connection
-            main_logger.info(f"[MAIN] New connection from {client_address[0]}:{client_address[1]}")
-            print(f"[+] Client connected from {client_address[0]}:{client_address[1]}")
 
-            # Spawn a new thread to handle this client
-            handler_thread = threading.Thread(
-                target=client_handler,
-                args=(client_socket, client_address, session_manager, main_logger),
-                daemon=True,
-                name=f"ClientHandler-{client_address[0]}:{client_address[1]}"
-            )
-            handler_thread.start()
+def _wake_waiter(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
 
-            main_logger.info(f"[MAIN] Handler thread started for {client_address[0]}:{client_address[1]}")
 
-        except Exception as e:
-            if not shutdown_event.is_set():
-                main_logger.error(f"[MAIN] Error in listener loop: {e}")
-                print(f"[!] ERROR in listener: {e}")
+# Client connections open across all listeners and workers
+_client_slots = _ClientSlots(config.MAX_CLIENTS)
 
-    main_logger.info("[MAIN] Connection listener thread shutting down")
-    print("[*] Connection listener stopped")
+
+class _Listener:
+    """
+    Listening sockets served by accept loop tasks on one event loop.
+
+    Takes the place of asyncio's Server so accepting can pause: each accept
+    loop waits for a free client slot (see _ClientSlots) before it accepts
+    and takes the slot afterwards, so at MAX_CLIENTS connections further
+    clients wait in the listen backlog instead of being accepted and
+    closed. Accepted sockets are handed to
+    loop.connect_accepted_socket, which does the TLS handshake (if enabled)
+    and runs handle_client through the MessageConnection protocol.
+    """
+
+    def __init__(self, sockets: list, ssl_context: Optional[ssl.SSLContext],
+                 session_manager: SessionManager, main_logger: logging.Logger):
+        """
+        Start accepting on the running event loop.
+
+        Args:
+            sockets: Bound, listening, non-blocking sockets
+            ssl_context: Server TLS context, or None
+            session_manager: Shared SessionManager for all sessions
+            main_logger: Logger for server-level events
+        """
+        self.sockets = sockets
+        self._ssl_context = ssl_context
+        self._main_logger = main_logger
+        self._factory = _connection_factory(session_manager, main_logger)
+        self._loop = asyncio.get_running_loop()
+        self._tasks = [self._loop.create_task(self._accept_loop(sock)) for sock in sockets]
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """Return the event loop the listener runs on."""
+        return self._loop
+
+    def close(self):
+        """Stop accepting (the sockets are closed by their accept loops)."""
+        for task in self._tasks:
+            task.cancel()
+
+    async def wait_closed(self):
+        """Wait until every accept loop has stopped."""
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _accept_loop(self, sock: socket.socket):
+        try:
+            while True:
+                if _client_slots.full():
+                    self._main_logger.warning("Max clients (%s) reached, new connections wait", config.MAX_CLIENTS)
+                await _client_slots.wait_free()
+                # Tries accept() before waiting for readiness, so a burst
+                # of queued connections needs no wakeup per client
+                client_socket, _ = await self._loop.sock_accept(sock)
+                try:
+                    # Another listener may have taken the last slot in the
+                    # meantime; then this connection waits for the next one
+                    await _client_slots.acquire()
+                except BaseException:
+                    client_socket.close()
+                    raise
+                self._loop.create_task(self._serve(client_socket))
+        except OSError as e:
+            self._main_logger.error("Accept loop stopped: %s", e)
+        finally:
+            sock.close()
+
+    async def _serve(self, client_socket: socket.socket):
+        """Run one accepted connection and free its slot once it closes."""
+        try:
+            _, connection = await self._loop.connect_accepted_socket(
+                self._factory,
+                client_socket,
+                ssl=self._ssl_context,
+                ssl_handshake_timeout=config.TLS_HANDSHAKE_TIMEOUT if self._ssl_context else None
+            )
+            await connection.wait_closed()
+        except (OSError, asyncio.TimeoutError) as e:
+            # Failed or timed-out TLS handshake, or peer gone already
+            self._main_logger.warning("Connection setup failed: %s", e)
+            client_socket.close()
+        finally:
+            _client_slots.release()
 
 
-def start_server(main_logger: logging.Logger) -> Optional[socket.socket]:
+async def start_server(
+    session_manager: SessionManager,
+    main_logger: logging.Logger,
+    ssl_context: Optional[ssl.SSLContext],
+    reuse_port: bool = False
+) -> Optional[_Listener]:
     """
-    Initialize and start the TCP server (Level 3: Multi-client version).
+    Initialize and start the TCP server on the running event loop.
+
+    Binds to the configured host and port and starts accepting connections.
+    The event loop accepts connections itself (no listener thread) and runs
+    handle_client as a new task for each one; with TLS enabled the handshake
+    is also done by the event loop before handle_client is called. Handshakes
+    are non-blocking, so a slow peer never delays other accepts, and one that
+    has not finished within TLS_HANDSHAKE_TIMEOUT seconds is dropped.
+
+    At MAX_CLIENTS open connections (counted across all workers) accepting
+    pauses, and new clients wait in the listen backlog until one leaves.
 
-    Creates a TCP socket, binds to the configured host and port,
-    and starts listening for connections. Does NOT accept connections -
-    the connection_listener thread handles that.
+    With reuse_port, every worker's event loop binds its own listening
+    socket to the port (SO_REUSEPORT) and the kernel distributes incoming
+    connections between them, so accepts are not serialized on one loop.
 
     Args:
+        session_manager: Shared SessionManager for all sessions
         main_logger: Logger for server-level events
+        ssl_context: Server TLS context, or None for plain TCP
+        reuse_port: Set SO_REUSEPORT (one listening socket per worker)
 
     Returns:
-        socket.socket: Server socket if successful
+        _Listener: The listening server if successful
         None: If server startup fails
     """
     try:
-        # Create TCP socket
-        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
-        # Set socket options to reuse address (helpful for quick restarts)
-        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sockets = []
+        try:
+            for family, _, _, _, address in socket.getaddrinfo(
+                config.SERVER_HOST, config.SERVER_PORT, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE
+            ):
+                if any(sock.family == family for sock in sockets):
+                    continue  # One socket per address family
+                sock = socket.socket(family, socket.SOCK_STREAM)
+                sockets.append(sock)
+                if os.name == 'posix':
+                    # Allow quick restarts while old connections are in TIME_WAIT
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                if reuse_port:
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+                if family == socket.AF_INET6 and hasattr(socket, 'IPPROTO_IPV6'):
+                    # The IPv4 address gets its own socket
+                    sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+                # Before listen(): the window scale is negotiated from it
+                protocol.set_buffer_sizes(sock)
+                sock.bind(address)
+                # Backlog queues up to MAX_CLIENTS pending connections
+                sock.listen(config.MAX_CLIENTS)
+                sock.setblocking(False)
+        except BaseException:
+            for sock in sockets:
+                sock.close()
+            raise
+
+        return _Listener(sockets, ssl_context, session_manager, main_logger)
 
-        # Bind to configured address and port
-        server_socket.bind((config.SERVER_HOST, config.SERVER_PORT))
+    except PermissionError:
+        console_print(f"[!] ERROR: Permission denied. Cannot bind to port {config.SERVER_PORT}")
+        console_print("[!] Try using a port > 1024 or run with elevated privileges")
+        main_logger.error("Permission denied on port %s", config.SERVER_PORT)
+        return None
+    except OSError as e:
+        console_print(f"[!] ERROR: Failed to start server: {e}")
+        main_logger.error("Failed to start server: %s", e)
+        return None
+    except Exception as e:
+        console_print(f"[!] ERROR: Unexpected error during server startup: {e}")
+        main_logger.error("Unexpected error during startup: %s", e)
+        return None
 
-        # Listen for incoming connections (queue up to MAX_CLIENTS)
-        server_socket.listen(config.MAX_CLIENTS)
 
-        print(f"[*] Server listening on {config.SERVER_HOST}:{config.SERVER_PORT}")
-        print(f"[*] Max clients: {config.MAX_CLIENTS}")
-        print()
+async def start_local_server(
+    session_manager: SessionManager,
+    main_logger: logging.Logger
+) -> Optional[_Listener]:
+    """
+    Initialize the local Unix socket listener, if configured.
 
-        main_logger.info(f"[MAIN] Server started on {config.SERVER_HOST}:{config.SERVER_PORT}")
-        main_logger.info(f"[MAIN] Max clients: {config.MAX_CLIENTS}")
+    Clients on the same host can connect through LOCAL_SOCKET_PATH instead
+    of TCP. This skips the TCP/IP stack and TLS; access is limited to the
+    server's user by the socket file's permissions (0600). Messages use the
+    same protocol framing as TCP, and connections are served by the same
+    event loop and handle_client coroutine, and count against MAX_CLIENTS.
 
-        return server_socket
+    Args:
+        session_manager: Shared SessionManager for all sessions
+        main_logger: Logger for server-level events
 
-    except PermissionError:
-        print(f"[!] ERROR: Permission denied. Cannot bind to port {config.SERVER_PORT}")
-        print("[!] Try using a port > 1024 or run with elevated privileges")
-        main_logger.error(f"[MAIN] Permission denied on port {config.SERVER_PORT}")
+    Returns:
+        _Listener: Listening Unix socket server
+        None: If LOCAL_SOCKET_PATH is unset, Unix sockets are unsupported,
+              or binding fails (TCP keeps working either way)
+    """
+    path = config.LOCAL_SOCKET_PATH
+    if not path or not hasattr(socket, 'AF_UNIX'):
         return None
+
+    try:
+        # Remove a stale socket file left by a previous run
+        if os.path.exists(path):
+            os.unlink(path)
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(path)
+            os.chmod(path, 0o600)
+            sock.listen(config.MAX_CLIENTS)
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            raise
+        local_server = _Listener([sock], None, session_manager, main_logger)
+
+        console_print(f"[*] Local clients can connect via {path}")
+        main_logger.info("Local socket listening on %s", path)
+        return local_server
+
     except OSError as e:
-        print(f"[!] ERROR: Failed to start server: {e}")
-        main_logger.error(f"[MAIN] Failed to start server: {e}")
-        return None
-    except Exception as e:
-        print(f"[!] ERROR: Unexpected error during server startup: {e}")
-        main_logger.error(f"[MAIN] Unexpected error during startup: {e}")
+        console_print(f"[!] WARNING: Cannot listen on local socket {path}: {e}")
+        main_logger.warning("Local socket disabled: %s", e)
         return None
 
 
-def handle_registration(client_socket: socket.socket, session_id: str, log: logging.Logger) -> Optional[str]:
+async def stop_servers(servers: list, session_manager: SessionManager, main_logger: logging.Logger):
+    """
+    Stop accepting connections and end every client handler task.
+
+    Runs on each event loop during shutdown. Every session on this loop gets
+    the _SHUTDOWN sentinel in its command queue: idle handlers wake up and
+    exit through their normal cleanup, which closes the connection and
+    removes the session. Handlers still waiting for a client result get
+    _SHUTDOWN_GRACE seconds to finish; the rest (and connections that have
+    not registered yet) are cancelled.
+
+    Args:
+        servers: Listening servers returned by start_server/start_local_server
+        session_manager: Shared SessionManager for all sessions
+        main_logger: Logger for server-level events
+    """
+    loop = asyncio.get_running_loop()
+    for server in servers:
+        server.close()
+
+    for session_id in session_manager.get_all_session_ids():
+        session = session_manager.get_session_by_session_id(session_id)
+        if session is None or session.loop is not loop:
+            continue
+        if session.command_queue.full():
+            # A full backlog would outlast the grace period anyway
+            session.handler_task.cancel()
+        else:
+            session.command_queue.put_nowait(_SHUTDOWN)
+
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    if tasks:
+        _, busy = await asyncio.wait(tasks, timeout=_SHUTDOWN_GRACE)
+        for task in busy:
+            task.cancel()
+        await asyncio.gather(*busy, return_exceptions=True)
+        main_logger.info("Stopped %s client handler task(s) (%s cancelled)", len(tasks), len(busy))
+
+    for server in servers:
+        await server.wait_closed()
+
+
+async def handle_registration(connection: protocol.MessageConnection, session_id: str, log: logging.Logger) -> Optional[str]:
     """
     Handle client registration protocol.
 
@@ -207,7 +599,7 @@ def handle_registration(client_socket: socket.socket, session_id: str, log: logg
     which should contain the client's ID/hostname and timestamp.
 
     Args:
-        client_socket: The connected client socket
+        connection: The connected client
         session_id: The session identifier for logging
         log: Logger instance for this session
 
@@ -215,81 +607,80 @@ def handle_registration(client_socket: socket.socket, session_id: str, log: logg
         str: The client_id if registration successful
         None: If registration fails
     """
-    print("[*] Waiting for client registration...")
+    console_print("[*] Waiting for client registration...")
 
     try:
-        # Receive registration message
-        reg_message = protocol.receive_message(client_socket)
+        # Receive registration message (the connection's size cap is
+        # MAX_REGISTRATION_SIZE until the peer has registered)
+        reg_message = await connection.receive_message()
 
         if reg_message is None:
-            print("[!] ERROR: Failed to receive registration message")
-            log.error(f"[{session_id}] Failed to receive registration message")
+            console_print("[!] ERROR: Failed to receive registration message")
+            log.error("Failed to receive registration message")
             return None
 
         # LOG: Registration message received
-        log.info(f"[{session_id}] Registration message received: {reg_message}")
+        log.info("Registration message received: %s", reg_message)
 
         # Validate message type
         if reg_message.get('type') != 'registration':
-            print(f"[!] ERROR: Invalid message type: {reg_message.get('type')}")
-            log.error(f"[{session_id}] Invalid registration message type: {reg_message.get('type')}")
+            console_print(f"[!] ERROR: Invalid message type: {reg_message.get('type')}")
+            log.error("Invalid registration message type: %s", reg_message.get('type'))
             return None
 
         # Extract client information
         client_id = reg_message.get('client_id')
-        timestamp = reg_message.get('timestamp')
+        timestamp = format_client_timestamp(reg_message.get('timestamp'))
 
         # Validate authentication token
         if config.AUTH_ENABLED:
             provided_token = reg_message.get('auth_token')
 
             if not provided_token:
-                print("[!] ERROR: Registration missing auth_token")
-                log.error(f"[{session_id}] Authentication failed: no token provided")
+                console_print("[!] ERROR: Registration missing auth_token")
+                log.error("Authentication failed: no token provided")
                 return None
 
             if provided_token != config.AUTH_TOKEN:
-                print("[!] ERROR: Invalid authentication token")
-                log.error(f"[{session_id}] Authentication failed: invalid token")
+                console_print("[!] ERROR: Invalid authentication token")
+                log.error("Authentication failed: invalid token")
                 return None
 
-            log.info(f"[{session_id}] Authentication successful")
+            log.info("Authentication successful")
 
         if not client_id:
-            print("[!] ERROR: Registration missing client_id")
-            log.error(f"[{session_id}] Registration missing client_id")
+            console_print("[!] ERROR: Registration missing client_id")
+            log.error("Registration missing client_id")
             return None
 
         # Display registration info
-        with print_lock:
-            print(f"[+] Client registered successfully!")
-            print(f"    Client ID: {client_id}")
-            if config.AUTH_ENABLED:
-                print(f"    Authenticated: YES")
-            print(f"    Timestamp: {timestamp}")
-            print()
+        console_print(
+            "[+] Client registered successfully!\n"
+            f"    Client ID: {client_id}\n"
+            + ("    Authenticated: YES\n" if config.AUTH_ENABLED else "")
+            + f"    Timestamp: {timestamp}\n"
+        )
 
         # LOG: Successful registration
-        log.info(f"[{session_id}] Client registered successfully: {client_id}")
+        log.info("Client registered successfully: %s", client_id)
 
         return client_id
 
     except Exception as e:
-        print(f"[!] ERROR: Registration failed: {e}")
-        log.error(f"[{session_id}] Registration failed: {e}")
+        console_print(f"[!] ERROR: Registration failed: {e}")
+        log.error("Registration failed: %s", e)
         return None
 
 
-def client_handler(
-    client_socket: socket.socket,
-    client_address: tuple,
+async def handle_client(
+    connection: protocol.MessageConnection,
     session_manager: SessionManager,
     main_logger: logging.Logger
 ):
     """
-    Handle a single client connection in a dedicated thread.
+    Handle a single client connection as an event loop task.
 
-    This function manages the complete lifecycle of a client connection:
+    This coroutine manages the complete lifecycle of a client connection:
     1. Generate session ID and create logger
     2. Handle client registration
     3. Create and register ClientSession
@@ -297,33 +688,47 @@ def client_handler(
     5. Send results back
     6. Cleanup on disconnect
 
-    This function runs in its own thread for each connected client,
-    enabling concurrent multi-client support.
+    The connection runs it as a new task once it is accepted (after the TLS
+    handshake, if enabled). All clients share the event loop
+    thread: while a handler awaits its command queue or a client's result,
+    the loop serves the other connections.
 
     Args:
-        client_socket: The connected client's socket
-        client_address: Tuple of (ip_address, port)
+        connection: The connected client
         session_manager: Shared SessionManager for registering this session
         main_logger: Main logger for server-level events
 
     Returns:
-        None (thread exits when client disconnects)
+        None (task ends when client disconnects or is cancelled at shutdown)
     """
+    client_address = _peer_address(connection)
+
+    # TCP_NODELAY, TCP_QUICKACK, buffer sizes and keepalive (Unix sockets are skipped)
+    protocol.tune_socket(connection.get_extra_info('socket'))
+
+    # Log the new connection (one record, including the TLS version if any)
+    ssl_object = connection.get_extra_info('ssl_object')
+    main_logger.info("New connection from %s:%s (%s)", client_address[0], client_address[1],
+                     ssl_object.version() if ssl_object is not None else "no TLS")
+    console_print(f"[+] Client connected from {client_address[0]}:{client_address[1]}")
+
     session = None
     session_id = generate_session_id()
     log = logger.setup_logger(session_id)
 
     try:
         # Log the new connection
-        log.info(f"[{session_id}] Client handler started for {client_address[0]}:{client_address[1]}")
+        log.info("Client handler started for %s:%s", client_address[0], client_address[1])
 
         # Handle client registration
-        client_id = handle_registration(client_socket, session_id, log)
+        client_id = await handle_registration(connection, session_id, log)
 
         if client_id is None:
-            log.error(f"[{session_id}] Registration failed, closing connection")
+            log.error("Registration failed, closing connection")
             return
 
+        connection.max_size = config.MAX_MESSAGE_SIZE
+
         # Continue using the same per-session logger (session_id-named file)
         # to keep all session events in a single log file.
 
@@ -331,201 +736,433 @@ def client_handler(
         session = ClientSession(
             session_id=session_id,
             client_id=client_id,
-            client_socket=client_socket,
+            connection=connection,
             client_address=client_address,
-            command_queue=queue.Queue(),
-            handler_thread=threading.current_thread(),
+            command_queue=asyncio.Queue(maxsize=config.MAX_PENDING_CMDS_PER_SESSION),
+            handler_task=asyncio.current_task(),
+            loop=asyncio.get_running_loop(),
             logger=log,
-            registered_at=datetime.now(),
-            last_activity=datetime.now(),
             connected=True
         )
 
         # Add session to manager
         if not session_manager.add_session(session):
-            log.error(f"[{session_id}] Client ID {client_id} already exists!")
-            print(f"[!] ERROR: Client ID {client_id} is already connected")
+            log.error("Client ID %s already exists!", client_id)
+            console_print(f"[!] ERROR: Client ID {client_id} is already connected")
             return
 
-        log.info(f"[{session_id}] Session registered in manager: {client_id}")
-        print(f"[+] Client {client_id} ready for commands")
-        print()
+        log.info("Session registered in manager: %s", client_id)
+        console_print(f"[+] Client {client_id} ready for commands")
+        console_print()
 
         # Main command loop - wait for commands from operator
-        while session.connected:
+        while True:
             try:
-                # Wait for command from operator (with timeout for responsive shutdown)
-                command = session.command_queue.get(timeout=1.0)
-
-                # Prepare command message
-                command_message = {
-                    'type': 'command',
-                    'command': command
-                }
+                # Wait for command from operator (no polling: the task sleeps
+                # until the operator queues a command or shutdown queues _SHUTDOWN)
+                command = await session.command_queue.get()
+                if command is _SHUTDOWN:
+                    log.info("Server shutting down, closing session")
+                    break
 
-                # Send command to client
-                success = protocol.send_message(client_socket, command_message)
+                # Send command to client (frame encoded once per distinct command)
+                try:
+                    success = await connection.send_frame(*_encode_command(command))
+                except (TypeError, ValueError, OverflowError) as e:
+                    log.error("Cannot encode command: %s", e)
+                    success = False
 
                 if success:
-                    log.info(f"[{session_id}] Command sent to {client_id}: {command}")
+                    log.info("Command sent to %s: %s", client_id, command)
 
                 if not success:
-                    log.error(f"[{session_id}] Failed to send command to {client_id}")
-                    print(f"[!] ERROR: Failed to send command to {client_id}")
+                    log.error("Failed to send command to %s", client_id)
+                    console_print(f"[!] ERROR: Failed to send command to {client_id}")
                     break
 
                 # Receive result from client
-                result_message = protocol.receive_message(client_socket)
+                result_message = await connection.receive_message()
 
                 if result_message is None:
-                    log.error(f"[{session_id}] Failed to receive result from {client_id}")
-                    print(f"[!] ERROR: Failed to receive result from {client_id}")
+                    log.error("Failed to receive result from %s", client_id)
+                    console_print(f"[!] ERROR: Failed to receive result from {client_id}")
                     break
 
                 # Validate result message type
                 if result_message.get('type') != 'result':
-                    log.warning(f"[{session_id}] Unexpected message type from {client_id}: {result_message.get('type')}")
+                    log.warning("Unexpected message type from %s: %s", client_id, result_message.get('type'))
                     continue
 
                 # LOG: Response received - Extract all fields
                 command = result_message.get('command', 'unknown')
-                stdout = result_message.get('stdout', '')
-                stderr = result_message.get('stderr', '')
+                stdout = protocol.as_text(result_message.get('stdout', ''))
+                stderr = protocol.as_text(result_message.get('stderr', ''))
                 return_code = result_message.get('return_code', -1)
-                client_timestamp = result_message.get('timestamp', 'unknown')
-
-                # Log command execution details
-                log.info(f"[{session_id}] Command executed: {command}")
-                log.info(f"[{session_id}] Return code: {return_code}")
-
-                # Log stdout (full output, no truncation)
-                if stdout:
-                    # Replace newlines with \n for single-line logging
-                    stdout_oneline = stdout.replace('\n', '\\n')
-                    log.info(f"[{session_id}] stdout: {stdout_oneline}")
-                else:
-                    log.info(f"[{session_id}] stdout: (empty)")
-
-                # Log stderr (full output, no truncation)
-                if stderr:
-                    stderr_oneline = stderr.replace('\n', '\\n')
-                    log.info(f"[{session_id}] stderr: {stderr_oneline}")
-                else:
-                    log.info(f"[{session_id}] stderr: (empty)")
 
-                log.info(f"[{session_id}] Client timestamp: {client_timestamp}")
+                # Log command execution details as one record - skip building
+                # the one-line output copies entirely when INFO is filtered out
+                if log.isEnabledFor(logging.INFO):
+                    # Full output, no truncation; newlines replaced with \n
+                    # for single-line logging
+                    log.info(
+                        "Command executed: %s | Return code: %s | stdout: %s | stderr: %s | Client timestamp: %s",
+                        command,
+                        return_code,
+                        stdout.replace('\n', '\\n') if stdout else '(empty)',
+                        stderr.replace('\n', '\\n') if stderr else '(empty)',
+                        format_client_timestamp(result_message.get('timestamp'))
+                    )
 
                 # Update activity timestamp
                 session.update_activity()
 
                 # Display results with client context
-                print(f"\n[Result from {client_id}]")
-                display_results(result_message)
-
-            except queue.Empty:
-                # No command in queue, continue waiting
-                continue
+                display_results(result_message, client_id)
 
             except Exception as e:
-                log.error(f"[{session_id}] Error in command loop: {e}")
-                print(f"[!] ERROR: Exception in handler for {client_id}: {e}")
+                log.error("Error in command loop: %s", e)
+                console_print(f"[!] ERROR: Exception in handler for {client_id}: {e}")
                 break
 
+    except asyncio.CancelledError:
+        log.info("Client handler cancelled (server shutdown)")
+        raise
+
     except Exception as e:
-        log.error(f"[{session_id}] Unexpected error in client handler: {e}")
-        print(f"[!] ERROR: Unexpected error handling client: {e}")
+        log.error("Unexpected error in client handler: %s", e)
+        console_print(f"[!] ERROR: Unexpected error handling client: {e}")
 
     finally:
-        # Cleanup: always execute, even on exception
+        # Cleanup: always execute, even on exception or cancellation
         if session:
             # Mark as disconnected
-            session.connected = False
+            session.mark_disconnected()
 
-            # Clear any pending commands to prevent memory leak
-            while not session.command_queue.empty():
-                try:
-                    session.command_queue.get_nowait()
-                except queue.Empty:
-                    break
-
-            # Remove from session manager
+            # Remove from session manager (pending commands are dropped
+            # with the queue)
             removed = session_manager.remove_session(session.session_id)
             if removed:
-                log.info(f"[{session_id}] Session removed from manager: {session.client_id}")
-                print(f"[-] Client {session.client_id} disconnected")
-                print()
+                log.info("Session removed from manager: %s", session.client_id)
+                console_print(f"[-] Client {session.client_id} disconnected\n")
 
-        # Close socket
+        # Close connection
         try:
-            client_socket.close()
-            log.info(f"[{session_id}] Client socket closed")
-        except:
+            connection.close()
+            await connection.wait_closed()
+            log.info("Client connection closed")
+        except Exception:
             pass
 
-        log.info(f"[{session_id}] Client handler thread exiting")
+        log.info("Client handler task exiting")
 
 
-def display_results(result_message: dict):
+def display_results(result_message: dict, client_id: Optional[str] = None):
     """
     Display command execution results in a formatted way.
 
-    Shows stdout, stderr, and return code clearly separated.
+    Shows stdout, stderr, and return code clearly separated. The whole
+    block is built as one string and queued with a single console_print,
+    so it cannot interleave with other output and costs one write.
 
     Args:
         result_message: The result message dictionary from client
+        client_id: Client the result came from, shown as a header line
     """
-    with print_lock:
-        print()
-        print("-" * 60)
-
-        # Display command info
-        command = result_message.get('command', 'Unknown')
-        return_code = result_message.get('return_code', -1)
-        print(f"Command: {command}")
-        print(f"Return Code: {return_code}")
-        print("-" * 60)
-
-        # Display stdout
-        stdout = result_message.get('stdout', '')
-        if stdout:
-            print("\n[STDOUT]:")
-            print(stdout)
-        else:
-            print("\n[STDOUT]: (empty)")
-
-        # Display stderr
-        stderr = result_message.get('stderr', '')
-        if stderr:
-            print("\n[STDERR]:")
-            print(stderr)
-        else:
-            print("\n[STDERR]: (empty)")
+    stdout = protocol.as_text(result_message.get('stdout', ''))
+    stderr = protocol.as_text(result_message.get('stderr', ''))
+
+    parts = []
+    if client_id is not None:
+        parts.append(f"\n[Result from {client_id}]\n")
+    parts.append(
+        f"\n{_SEP}\n"
+        f"Command: {result_message.get('command', 'Unknown')}\n"
+        f"Return Code: {result_message.get('return_code', -1)}\n"
+        f"{_SEP}\n"
+    )
+    parts.append(f"\n[STDOUT]:\n{stdout}\n" if stdout else "\n[STDOUT]: (empty)\n")
+    parts.append(f"\n[STDERR]:\n{stderr}\n" if stderr else "\n[STDERR]: (empty)\n")
+    parts.append(f"{_SEP}\n\n")
 
-        print("-" * 60)
-        print()
+    console_print(''.join(parts), end='')
 
 
 def display_help():
     """
     Display available operator commands (Level 3: Multi-client version).
     """
-    with print_lock:
-        print()
-        print("Available Commands:")
-        print("  sessions             - List all active client sessions")
-        print("  use <session_id>     - Switch to a specific session (e.g., 'use SESSION-20250126153045-a1b2')")
-        print("  help                 - Show this help message")
-        print("  exit, quit           - Close all connections and exit server")
-        print()
-        print("When a session is selected (using 'use <session_id>'):")
-        print("  Any other input will be sent as a shell command to that client")
-        print()
+    console_print(_HELP_TEXT)
+
+
+class OperatorInput:
+    """
+    Operator console line reader that a shutdown request can interrupt.
+
+    Waits on stdin and a self-pipe with one selector: wake() (callable from
+    any thread or a signal handler) makes a pending readline() return None,
+    so the operator loop ends without waiting for another line of input.
+    Lines are read from the stdin file descriptor directly and split here,
+    so input that arrives in bursts is never stranded in a Python buffer
+    the selector cannot see.
+
+    Where stdin cannot be polled (Windows consoles, regular files), a
+    daemon thread reads it line by line into a queue.SimpleQueue instead,
+    and wake() queues a wakeup marker next to the lines, so readline()
+    can be interrupted there too.
+    """
+
+    # Queued by the reader thread at end of input, and by wake()
+    _EOF = object()
+    _WAKE = object()
+
+    def __init__(self):
+        """Set up the selector, or the reader thread fallback."""
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._wake_fds: Optional[tuple] = None
+        self._lines: Optional[queue.SimpleQueue] = None
+        self._pending = b''
+        self._encoding = sys.stdin.encoding or 'utf-8'
+
+        try:
+            if os.name == 'nt':
+                raise OSError("console handles cannot be polled")
+            selector = selectors.DefaultSelector()
+            selector.register(sys.stdin.fileno(), selectors.EVENT_READ, 'stdin')
+        except (OSError, ValueError):
+            self._lines = queue.SimpleQueue()
+            threading.Thread(target=self._read_lines, daemon=True, name="OperatorInput").start()
+            return
+
+        wake_r, wake_w = os.pipe()
+        os.set_blocking(wake_w, False)
+        selector.register(wake_r, selectors.EVENT_READ, 'wake')
+        self._selector = selector
+        self._wake_fds = (wake_r, wake_w)
+
+    def _read_lines(self):
+        """Queue stdin lines until end of input (runs on the OperatorInput thread)."""
+        try:
+            for line in sys.stdin:
+                self._lines.put(line.rstrip('\r\n'))
+        except (OSError, ValueError):
+            pass  # stdin closed
+        self._lines.put(self._EOF)
+
+    @property
+    def interruptible(self) -> bool:
+        """True if wake() can interrupt readline() (always, in either mode)."""
+        return self._selector is not None or self._lines is not None
+
+    def wake(self):
+        """Interrupt a pending readline()."""
+        if self._lines is not None:
+            self._lines.put(self._WAKE)
+        elif self._wake_fds is not None:
+            try:
+                os.write(self._wake_fds[1], b'\0')
+            except OSError:
+                pass  # Pipe full - a wakeup is already pending
+
+    def readline(self, prompt: str) -> Optional[str]:
+        """
+        Show the prompt and read one line of operator input.
+
+        Args:
+            prompt: Prompt text
+
+        Returns:
+            str: The line, without the trailing newline
+            None: If wake() was called
+
+        Raises:
+            EOFError: If stdin is closed (Ctrl+D)
+        """
+        # The prompt goes through the console queue to stay in order
+        console_print(prompt, end='')
+
+        if self._lines is not None:
+            while True:
+                try:
+                    # Wait in slices so Ctrl+C is still delivered on Windows
+                    line = self._lines.get(timeout=0.5)
+                    break
+                except queue.Empty:
+                    continue
+            if line is self._WAKE:
+                return None
+            if line is self._EOF:
+                self._lines.put(self._EOF)  # Later calls see EOF too
+                raise EOFError
+            return line
+
+        fd = sys.stdin.fileno()
+
+        while b'\n' not in self._pending:
+            for key, _ in self._selector.select():
+                if key.data == 'wake':
+                    return None
+            data = os.read(fd, 4096)
+            if not data:
+                if not self._pending:
+                    raise EOFError
+                break  # Last line without a newline
+            self._pending += data
+
+        line, _, self._pending = self._pending.partition(b'\n')
+        return line.decode(self._encoding, 'replace')
+
+    def close(self):
+        """Release the selector and the self-pipe (the reader thread is a daemon)."""
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+        if self._wake_fds is not None:
+            for fd in self._wake_fds:
+                os.close(fd)
+            self._wake_fds = None
+
+
+@dataclass
+class _OperatorState:
+    """
+    What operator command handlers work on (see operator_interface).
+
+    Attributes:
+        session_manager: Shared SessionManager for all sessions
+        main_logger: Logger for operator actions
+        shutdown_event: Set by 'exit'/'quit' to end the operator loop
+        current_session_id: Session selected with 'use', if any
+        prompt: Operator prompt for the selected session (see select)
+    """
+    session_manager: SessionManager
+    main_logger: logging.Logger
+    shutdown_event: threading.Event
+    current_session_id: Optional[str] = None
+    prompt: str = _PROMPT
+
+    def select(self, session: Optional[ClientSession]):
+        """
+        Make session the active one (None to deselect) and build its prompt.
+        """
+        if session is None:
+            self.current_session_id = None
+            self.prompt = _PROMPT
+        else:
+            self.current_session_id = session.session_id
+            self.prompt = f"C2 [{session.client_id}|{session.session_id}]> "
+
+
+def _operator_exit(state: _OperatorState, arg: str):
+    """Shut the server down ('exit', 'quit')."""
+    console_print("[*] Shutting down server...")
+    state.main_logger.info("Operator requested exit")
+    state.shutdown_event.set()
+
+
+def _operator_help(state: _OperatorState, arg: str):
+    """Show the available commands ('help')."""
+    display_help()
+
+
+def _operator_sessions(state: _OperatorState, arg: str):
+    """List all active sessions ('sessions')."""
+    sessions = state.session_manager.list_sessions()
+    lines = ["", f"Active Sessions ({len(sessions)}):", "-" * 100]
+
+    if not sessions:
+        lines.append("  (no active sessions)")
+    else:
+        for s in sessions:
+            status = "CONNECTED" if s['connected'] else "DISCONNECTED"
+            active_marker = " <-- ACTIVE" if s['session_id'] == state.current_session_id else ""
+            lines.append(f"  [{status}] Session: {s['session_id']:<30} | Client: {s['client_id']:<20} | {s['address']:<21}{active_marker}")
+
+    lines += ["-" * 100, ""]
+    console_print("\n".join(lines))
+    state.main_logger.info("Operator listed sessions (count: %s)", len(sessions))
+
+
+def _operator_use(state: _OperatorState, target_session_id: str):
+    """Switch to a specific session ('use <session_id>')."""
+    if not target_session_id:
+        console_print("[!] ERROR: Please specify a session_id (e.g., 'use SESSION-0019a168da548000')")
+        return
+
+    # Verify the session exists
+    session = state.session_manager.get_session_by_session_id(target_session_id)
+
+    if session is None:
+        console_print(f"[!] ERROR: No session found with ID '{target_session_id}'")
+        console_print("[*] Use 'sessions' command to see available sessions")
+        return
+
+    if not session.connected:
+        console_print(f"[!] WARNING: Session '{target_session_id}' is disconnected")
+        console_print("[*] You can select it, but commands will fail")
+
+    # Switch to this session
+    state.select(session)
+    console_print(f"[*] Switched to session: {target_session_id} (Client: {session.client_id})")
+    state.main_logger.info("Operator switched to session: %s", target_session_id)
+
+
+def _operator_send(state: _OperatorState, command: str):
+    """Send a shell command to the active session (any other input)."""
+    current_session_id = state.current_session_id
+    if not current_session_id:
+        console_print("[!] ERROR: No active session selected")
+        console_print("[*] Use 'sessions' to list sessions, then 'use <session_id>' to select one")
+        return
+
+    # Get the session
+    session = state.session_manager.get_session_by_session_id(current_session_id)
+
+    if session is None:
+        console_print(f"[!] ERROR: Session '{current_session_id}' no longer exists")
+        console_print("[*] Client may have disconnected. Use 'sessions' to see active sessions")
+        state.select(None)
+        return
+
+    if not session.connected:
+        console_print(f"[!] ERROR: Session '{current_session_id}' is disconnected")
+        state.select(None)
+        return
+
+    # The queue is bounded so a flood of commands to a slow client
+    # cannot grow without limit. The operator is its only producer
+    # and the handler task only removes items, so a queue that is
+    # not full here still has room when the put runs on the loop.
+    if session.command_queue.full():
+        console_print(f"[!] Command queue full; client is slow ({config.MAX_PENDING_CMDS_PER_SESSION} commands pending)")
+        state.main_logger.warning("Command queue full for session %s, command dropped: %s", current_session_id, command)
+        return
+
+    # Queue the command for the client handler task. asyncio.Queue
+    # is not thread-safe, so the put runs on the session's event loop.
+    session.loop.call_soon_threadsafe(session.command_queue.put_nowait, command)
+    state.main_logger.info("Command queued for session %s (client: %s): %s", current_session_id, session.client_id, command)
+
+
+# Built-in operator commands, looked up by the whole (lowercased) input line
+_OPERATOR_COMMANDS = {
+    'exit': _operator_exit,
+    'quit': _operator_exit,
+    'help': _operator_help,
+    'sessions': _operator_sessions,
+    'use': _operator_use,
+}
+
+# Built-in commands that take an argument, looked up by the first word
+_OPERATOR_ARG_COMMANDS = {
+    'use': _operator_use,
+}
 
 
 def operator_interface(
     session_manager: SessionManager,
     main_logger: logging.Logger,
-    shutdown_event: threading.Event
+    shutdown_event: threading.Event,
+    operator_input: OperatorInput
 ):
     """
     Main operator interface loop (Level 3: Multi-client version).
@@ -536,151 +1173,80 @@ def operator_interface(
     - Send commands to the active client
     - Exit gracefully
 
-    This function runs in the main thread and interacts with client
-    handler threads via the SessionManager and command queues.
+    This function runs in the main thread and interacts with the client
+    handler tasks on the event loop threads via the SessionManager and
+    command queues. It returns when the operator exits, or when
+    shutdown_event is set elsewhere and operator_input.wake() is called.
 
     Args:
         session_manager: Shared SessionManager for all sessions
         main_logger: Logger for operator actions
         shutdown_event: Event to signal shutdown to all threads
+        operator_input: Console reader for operator commands
 
     Returns:
         None (runs until operator exits)
     """
-    print("=" * 60)
-    print("OPERATOR INTERFACE - Multi-Client Mode")
-    print("=" * 60)
-    print("Type 'help' for available commands")
-    print("Type 'sessions' to list connected clients")
-    print()
+    console_print(
+        f"{'=' * 60}\n"
+        "OPERATOR INTERFACE - Multi-Client Mode\n"
+        f"{'=' * 60}\n"
+        "Type 'help' for available commands\n"
+        "Type 'sessions' to list connected clients\n"
+    )
 
-    current_session_id = None  # Track which session is currently active
+    state = _OperatorState(session_manager, main_logger, shutdown_event)
 
     try:
         while not shutdown_event.is_set():
-            # Build prompt based on whether a session is selected
-            if current_session_id:
-                # Get the session to show client_id in prompt
-                active_session = session_manager.get_session_by_session_id(current_session_id)
-                if active_session:
-                    prompt = f"C2 [{active_session.client_id}|{current_session_id}]> "
-                else:
-                    # Session no longer exists
-                    current_session_id = None
-                    prompt = "C2> "
-            else:
-                prompt = "C2> "
+            # The prompt is built once per 'use'; drop it if the session is gone
+            if state.current_session_id and session_manager.get_session_by_session_id(state.current_session_id) is None:
+                state.select(None)
 
             # Get command from operator
             try:
-                command = input(prompt).strip()
+                command = operator_input.readline(state.prompt)
             except EOFError:
                 # Handle Ctrl+D
-                print()
-                print("[*] EOF received. Exiting...")
-                main_logger.info("[MAIN] EOF received, exiting operator interface")
+                console_print()
+                console_print("[*] EOF received. Exiting...")
+                main_logger.info("EOF received, exiting operator interface")
                 break
 
-            # Handle empty input
-            if not command:
-                continue
-
-            # Handle special commands
-            if command.lower() in ['exit', 'quit']:
-                print("[*] Shutting down server...")
-                main_logger.info("[MAIN] Operator requested exit")
-                shutdown_event.set()
+            if command is None:
+                # Woken up for shutdown (e.g. SIGTERM)
+                console_print()
+                main_logger.info("Shutdown requested, exiting operator interface")
                 break
+            command = command.strip()
 
-            elif command.lower() == 'help':
-                display_help()
-                continue
-
-            elif command.lower() == 'sessions':
-                # List all active sessions
-                sessions = session_manager.list_sessions()
-                with print_lock:
-                    print()
-                    print(f"Active Sessions ({len(sessions)}):")
-                    print("-" * 100)
-
-                    if not sessions:
-                        print("  (no active sessions)")
-                    else:
-                        for s in sessions:
-                            status = "CONNECTED" if s['connected'] else "DISCONNECTED"
-                            active_marker = " <-- ACTIVE" if s['session_id'] == current_session_id else ""
-                            print(f"  [{status}] Session: {s['session_id']:<30} | Client: {s['client_id']:<20} | {s['address']:<21}{active_marker}")
-
-                    print("-" * 100)
-                    print()
-                main_logger.info(f"[MAIN] Operator listed sessions (count: {len(sessions)})")
+            # Handle empty input
+            if not command:
                 continue
 
-            elif command.lower().startswith('use '):
-                # Switch to a specific session
-                target_session_id = command[4:].strip()
-
-                if not target_session_id:
-                    print("[!] ERROR: Please specify a session_id (e.g., 'use SESSION-20250126153045-a1b2')")
-                    continue
-
-                # Verify the session exists
-                session = session_manager.get_session_by_session_id(target_session_id)
+            # Built-in commands: exact match for bare words, first word for
+            # commands that take an argument (e.g. 'use <session_id>')
+            handler = _OPERATOR_COMMANDS.get(command.lower())
+            arg = ''
+            if handler is None:
+                head, _, arg = command.partition(' ')
+                handler = _OPERATOR_ARG_COMMANDS.get(head.lower())
+            if handler is None:
+                handler = _operator_send
+                arg = command
 
-                if session is None:
-                    print(f"[!] ERROR: No session found with ID '{target_session_id}'")
-                    print("[*] Use 'sessions' command to see available sessions")
-                    continue
-
-                if not session.connected:
-                    print(f"[!] WARNING: Session '{target_session_id}' is disconnected")
-                    print("[*] You can select it, but commands will fail")
-
-                # Switch to this session
-                current_session_id = target_session_id
-                print(f"[*] Switched to session: {current_session_id} (Client: {session.client_id})")
-                main_logger.info(f"[MAIN] Operator switched to session: {current_session_id}")
-                continue
-
-            else:
-                # Regular command - send to active session
-                if not current_session_id:
-                    print("[!] ERROR: No active session selected")
-                    print("[*] Use 'sessions' to list sessions, then 'use <session_id>' to select one")
-                    continue
-
-                # Get the session
-                session = session_manager.get_session_by_session_id(current_session_id)
-
-                if session is None:
-                    print(f"[!] ERROR: Session '{current_session_id}' no longer exists")
-                    print("[*] Client may have disconnected. Use 'sessions' to see active sessions")
-                    current_session_id = None
-                    continue
-
-                if not session.connected:
-                    print(f"[!] ERROR: Session '{current_session_id}' is disconnected")
-                    current_session_id = None
-                    continue
-
-                # Queue the command for the client handler thread
-                session.command_queue.put(command)
-                main_logger.info(f"[MAIN] Command queued for session {current_session_id} (client: {session.client_id}): {command}")
-
-                # Note: Results will be displayed by the client_handler thread
-                # No need to wait here - the handler thread prints results directly
+            handler(state, arg.strip())
 
     except KeyboardInterrupt:
         # Handle Ctrl+C
-        print()
-        print("[*] Keyboard interrupt received. Shutting down...")
-        main_logger.info("[MAIN] Keyboard interrupt received")
+        console_print()
+        console_print("[*] Keyboard interrupt received. Shutting down...")
+        main_logger.info("Keyboard interrupt received")
         shutdown_event.set()
 
     except Exception as e:
-        print(f"[!] ERROR: Unexpected error in operator interface: {e}")
-        main_logger.error(f"[MAIN] Unexpected error in operator interface: {e}")
+        console_print(f"[!] ERROR: Unexpected error in operator interface: {e}")
+        main_logger.error("Unexpected error in operator interface: %s", e)
         shutdown_event.set()
 
 
@@ -691,110 +1257,179 @@ def main():
     Orchestrates the multi-client server startup:
     1. Display banner
     2. Create main logger
-    3. Start server socket
-    4. Create session manager
-    5. Start listener thread
-    6. Run operator interface (main thread)
-    7. Graceful shutdown of all threads and connections
+    3. Load TLS context (if enabled)
+    4. Create session manager and SERVER_WORKERS event loops
+    5. Start TCP (and optional local) servers on the event loops
+    6. Run each event loop in a background thread
+    7. Run operator interface (main thread)
+    8. Graceful shutdown of all client tasks and connections
     """
+    # All console output is written by one background thread
+    start_console_writer()
+
     # Display banner
     display_banner()
 
     # Create main logger for server-level events
     main_logger = logger.setup_logger("MAIN")
-    main_logger.info("[MAIN] C2 Server starting...")
-
-    # Start server (create and bind socket)
-    server_socket = start_server(main_logger)
-    if server_socket is None:
-        print("[!] Server startup failed. Exiting.")
-        main_logger.error("[MAIN] Server startup failed")
-        sys.exit(1)
+    main_logger.info("C2 Server starting...")
 
     ssl_context = None
     if config.TLS_ENABLED:
         try:
-            print("[*] TLS enabled. Loading certificate...")
+            console_print("[*] TLS enabled. Loading certificate...")
             ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
             ssl_context.load_cert_chain(certfile=config.TLS_CERTFILE, keyfile=config.TLS_KEYFILE)
-            print("[+] Certificate loaded successfully")
+            # Same protocol floor and AES-GCM cipher suites as the client
+            ssl_context.minimum_version = ssl.TLSVersion[config.TLS_MINIMUM_VERSION]
+            ssl_context.set_ciphers(config.TLS_CIPHERS)
+            # TLS 1.3 session tickets. The bundled client never resumes a
+            # session (it does not reconnect once registered), so none are
+            # issued by default; set TLS_SESSION_TICKETS for other clients
+            # that present tickets. The context (and its ticket key) is
+            # shared by every accept.
+            ssl_context.options &= ~ssl.OP_NO_TICKET
+            if config.TLS_SESSION_TICKETS > 0:
+                ssl_context.num_tickets = config.TLS_SESSION_TICKETS
+            else:
+                ssl_context.options |= ssl.OP_NO_TICKET
+                ssl_context.num_tickets = 0
+            console_print("[+] Certificate loaded successfully")
         except Exception as e:
-            print(f"[!] ERROR: Failed to load TLS certificate: {e}")
-            main_logger.error(f"[MAIN] Failed to load TLS: {e}")
-            server_socket.close()
+            console_print(f"[!] ERROR: Failed to load TLS certificate: {e}")
+            main_logger.error("Failed to load TLS: %s", e)
             sys.exit(1)
 
     # Create session manager
     session_manager = SessionManager()
-    main_logger.info("[MAIN] Session manager initialized")
+    main_logger.info("Session manager initialized")
+
+    # Several event loops can accept on the same port through SO_REUSEPORT;
+    # the kernel spreads incoming connections across their sockets
+    # (SERVER_WORKERS = 0 starts one per CPU)
+    workers = config.SERVER_WORKERS or os.cpu_count() or 1
+    if workers > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        console_print("[!] WARNING: SO_REUSEPORT is not supported here, using one server worker")
+        main_logger.warning("SO_REUSEPORT unsupported, SERVER_WORKERS=%s ignored", workers)
+        workers = 1
+
+    # Each worker is one event loop serving its share of the client
+    # connections. uvloop (libuv) batches readiness events and runs
+    # transports in C: fewer syscalls and less interpreter work per message
+    # than the stdlib selector loop.
+    # One bounded thread pool, shared by all loops, decodes large payloads
+    # (see protocol.MessageConnection.receive_message) so they do not block a loop.
+    decode_executor = ThreadPoolExecutor(max_workers=config.DECODE_WORKERS, thread_name_prefix="Decode")
+    loops = []
+    servers = []
+    local_server = None
+    for index in range(workers):
+        if config.USE_UVLOOP and uvloop is not None:
+            loop = uvloop.new_event_loop()
+        else:
+            loop = asyncio.new_event_loop()
+        loop.set_default_executor(decode_executor)
+        loops.append(loop)
+
+        # Start server (bind and start accepting on the event loop)
+        server = loop.run_until_complete(start_server(session_manager, main_logger, ssl_context,
+                                                      reuse_port=workers > 1))
+        if server is None:
+            console_print("[!] Server startup failed. Exiting.")
+            main_logger.error("Server startup failed")
+            for started in servers:
+                started.close()
+                started.get_loop().run_until_complete(started.wait_closed())
+            for started_loop in loops:
+                started_loop.close()
+            decode_executor.shutdown(wait=False)
+            sys.exit(1)
+        servers.append(server)
+
+    console_print(f"[*] Server listening on {config.SERVER_HOST}:{config.SERVER_PORT}")
+    console_print(f"[*] Max clients: {config.MAX_CLIENTS}")
+    main_logger.info("Server started on %s:%s (%s worker(s), event loop: %s)",
+                     config.SERVER_HOST, config.SERVER_PORT, workers, type(loops[0]).__module__)
+    main_logger.info("Max clients: %s", config.MAX_CLIENTS)
+
+    # Optional local (Unix socket) listener for clients on this host - no TLS.
+    # Served by the first worker.
+    local_server = loops[0].run_until_complete(start_local_server(session_manager, main_logger))
+    if local_server is not None:
+        servers.append(local_server)
+    console_print()
 
     # Create shutdown event for coordinating thread shutdown
     shutdown_event = threading.Event()
 
-    # Start connection listener thread
-    listener_thread = threading.Thread(
-        target=connection_listener,
-        args=(server_socket, session_manager, main_logger, shutdown_event, ssl_context), 
-        daemon=True,
-        name="ConnectionListener"
-    )
-    listener_thread.start()
-    main_logger.info("[MAIN] Listener thread started")
+    # Run each event loop in a background thread; the operator's input()
+    # blocks the main thread
+    loop_threads = []
+    for index, loop in enumerate(loops):
+        loop_thread = threading.Thread(target=loop.run_forever, daemon=True, name=f"EventLoop-{index}")
+        loop_thread.start()
+        loop_threads.append(loop_thread)
+    main_logger.info("Started %s event loop thread(s)", len(loop_threads))
+    console_print("[*] Waiting for client connections...\n")
+
+    # Operator console; SIGTERM wakes it for a graceful shutdown
+    operator_input = OperatorInput()
+    if operator_input.interruptible:
+        def request_shutdown(signum, frame):
+            shutdown_event.set()
+            operator_input.wake()
+        signal.signal(signal.SIGTERM, request_shutdown)
 
     try:
         # Run operator interface in main thread (blocks here)
-        operator_interface(session_manager, main_logger, shutdown_event)
+        operator_interface(session_manager, main_logger, shutdown_event, operator_input)
 
     finally:
-        # Cleanup: shutdown all threads and close all connections
-        print()
-        print("[*] Shutting down server...")
-        main_logger.info("[MAIN] Beginning shutdown sequence")
+        # Cleanup: stop accepting and close all connections
+        console_print()
+        console_print("[*] Shutting down server...")
+        main_logger.info("Beginning shutdown sequence")
 
         # Signal shutdown to all threads
         shutdown_event.set()
+        operator_input.close()
+
+        # End all client handler tasks on every loop; each one closes its
+        # connection and removes its session as it exits
+        console_print("[*] Closing all client connections...")
+        pending = []
+        for loop in loops:
+            loop_servers = [server for server in servers if server.get_loop() is loop]
+            pending.append(asyncio.run_coroutine_threadsafe(stop_servers(loop_servers, session_manager, main_logger), loop))
+        for future in pending:
+            try:
+                future.result(timeout=5.0)
+            except Exception as e:
+                main_logger.error("Error stopping server: %s", e)
+        console_print("[*] Server socket closed")
+        main_logger.info("Server socket closed")
+
+        # Stop the event loops
+        for loop, loop_thread in zip(loops, loop_threads):
+            loop.call_soon_threadsafe(loop.stop)
+            loop_thread.join(timeout=5.0)
+            if loop_thread.is_alive():
+                main_logger.warning("%s did not stop gracefully", loop_thread.name)
+            else:
+                loop.close()
+        decode_executor.shutdown(wait=False)
+        main_logger.info("Event loops stopped")
 
-        # Wait for listener thread to finish (with timeout)
-        print("[*] Stopping connection listener...")
-        listener_thread.join(timeout=5.0)
-        if listener_thread.is_alive():
-            main_logger.warning("[MAIN] Listener thread did not stop gracefully")
-        else:
-            main_logger.info("[MAIN] Listener thread stopped")
-
-        # Close all client connections
-        print("[*] Closing all client connections...")
-        session_ids = session_manager.get_all_session_ids()
-
-        for session_id in session_ids:
-            session = session_manager.get_session_by_session_id(session_id)
-            if session:
-                try:
-                    # Mark as disconnected
-                    session.connected = False
-
-                    # Close socket
-                    session.client_socket.close()
-                    main_logger.info(f"[MAIN] Closed connection to session {session_id} (client: {session.client_id})")
-                except Exception as e:
-                    main_logger.error(f"[MAIN] Error closing connection to session {session_id}: {e}")
-
-        # Give handler threads time to exit gracefully
-        print("[*] Waiting for handler threads to finish...")
-        import time
-        time.sleep(2)
-
-        # Close server socket
-        try:
-            server_socket.close()
-            print("[*] Server socket closed")
-            main_logger.info("[MAIN] Server socket closed")
-        except Exception as e:
-            main_logger.error(f"[MAIN] Error closing server socket: {e}")
-
-        print("[*] Server shutdown complete")
-        main_logger.info("[MAIN] Server shutdown complete")
-        print()
+        if local_server is not None:
+            try:
+                os.unlink(config.LOCAL_SOCKET_PATH)
+            except OSError as e:
+                main_logger.error("Error removing local socket: %s", e)
+
+        console_print("[*] Server shutdown complete")
+        main_logger.info("Server shutdown complete")
+        console_print()
+        stop_console_writer()
 
 
 if __name__ == '__main__':
@@ -5,26 +5,49 @@ This module defines the ClientSession dataclass that represents
 a single connected client with all its associated state and resources.
 
 Each session includes:
-- Connection information (socket, address)
+- Connection information (message connection, address)
 - Session identifiers (session_id, client_id)
 - Communication channels (command queue)
-- Thread management (handler thread reference)
+- Task management (handler task reference)
 - Logging (dedicated logger)
 - Activity tracking (timestamps, connection status)
 
 This is for authorized security testing and educational purposes only.
 """
 
-import socket
-import queue
-import threading
+import asyncio
 import logging
+import sys
+import time
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional
+from common import protocol
 
 
-@dataclass
+def _format_monotonic(timestamp: float) -> str:
+    """
+    Format a time.monotonic() value as local wall-clock time.
+
+    Sessions record activity with the cheap monotonic clock; the wall-clock
+    time is only derived when a listing is displayed.
+
+    Args:
+        timestamp: A time.monotonic() value
+
+    Returns:
+        str: Local time as 'YYYY-MM-DD HH:MM:SS'
+    """
+    wall_clock = time.time() - (time.monotonic() - timestamp)
+    return datetime.fromtimestamp(wall_clock).strftime('%Y-%m-%d %H:%M:%S')
+
+
+# Sessions use __slots__ (no per-instance __dict__) where dataclass supports
+# it (Python 3.10+); older versions get a regular dataclass
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_SLOTS)
 class ClientSession:
     """
     Represents a single connected client session.
@@ -33,16 +56,21 @@ class ClientSession:
     including the network connection, command queue, logging, and metadata.
 
     Attributes:
-        session_id: Unique session identifier (SESSION-YYYYMMDDHHMMSS-xxxx)
+        session_id: Unique session identifier (SESSION-<16 hex digits>)
         client_id: Client's hostname or unique identifier
-        client_socket: TCP socket for this client
+        connection: Event loop connection (protocol) of this client
         client_address: Tuple of (ip_address, port)
-        command_queue: Queue for operator commands to this client
-        handler_thread: Thread handling this client's communication
+        command_queue: asyncio.Queue for operator commands to this client
+                       (bounded by MAX_PENDING_CMDS_PER_SESSION);
+                       other threads must add to it with
+                       session.loop.call_soon_threadsafe(command_queue.put_nowait, cmd)
+        handler_task: Event loop task handling this client's communication
+        loop: Event loop (server worker) running handler_task
         logger: Dedicated logger instance for this session
-        registered_at: Timestamp when client registered
-        last_activity: Timestamp of last command/response
-        connected: Whether client is still connected
+        registered_at: time.monotonic() when client registered
+        registered_at_str: registered_at as local time (set once at creation)
+        last_activity: time.monotonic() of last command/response
+        connected: Whether client is still connected (cleared with mark_disconnected)
     """
 
     # Identifiers
@@ -50,30 +78,48 @@ class ClientSession:
     client_id: str
 
     # Network
-    client_socket: socket.socket
+    connection: protocol.MessageConnection
     client_address: tuple  # (ip, port)
 
-    # Communication
-    command_queue: queue.Queue = field(default_factory=queue.Queue)
+    # Communication (created on the event loop, see handle_client)
+    command_queue: asyncio.Queue = field(default_factory=asyncio.Queue)
 
-    # Threading
-    handler_thread: Optional[threading.Thread] = None
+    # Event loop task and the worker loop it runs on
+    handler_task: Optional[asyncio.Task] = None
+    loop: Optional[asyncio.AbstractEventLoop] = None
 
     # Logging
     logger: Optional[logging.Logger] = None
 
     # Timestamps
-    registered_at: datetime = field(default_factory=datetime.now)
-    last_activity: datetime = field(default_factory=datetime.now)
+    registered_at: float = field(default_factory=time.monotonic)
+    last_activity: float = field(default_factory=time.monotonic)
+
+    # registered_at as local time, formatted once (it never changes)
+    registered_at_str: str = field(init=False, repr=False, compare=False)
 
     # Status
     connected: bool = True
 
+    # get_info_dict() result, cleared whenever last_activity or connected changes
+    _info_cache: Optional[dict] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.registered_at_str = _format_monotonic(self.registered_at)
+
     def update_activity(self):
         """
         Update the last_activity timestamp to current time.
         """
-        self.last_activity = datetime.now()
+        self.last_activity = time.monotonic()
+        self._info_cache = None
+
+    def mark_disconnected(self):
+        """
+        Mark the session as disconnected (set connected to False).
+        """
+        self.connected = False
+        self._info_cache = None
 
     def is_active(self) -> bool:
         """
@@ -91,14 +137,21 @@ class ClientSession:
         Returns a snapshot of the session state suitable for displaying
         to the operator (e.g., in session listing).
 
+        The dict is built once and reused until update_activity() or
+        mark_disconnected() changes the session, so repeated listings do
+        no formatting. Callers share it and must not modify it.
+
         Returns:
             dict: Session information with string-formatted values
         """
-        return {
-            'client_id': self.client_id,
-            'session_id': self.session_id,
-            'address': f"{self.client_address[0]}:{self.client_address[1]}",
-            'connected': self.connected,
-            'registered_at': self.registered_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'last_activity': self.last_activity.strftime('%Y-%m-%d %H:%M:%S')
-        }
+        info = self._info_cache
+        if info is None:
+            info = self._info_cache = {
+                'client_id': self.client_id,
+                'session_id': self.session_id,
+                'address': f"{self.client_address[0]}:{self.client_address[1]}",
+                'connected': self.connected,
+                'registered_at': self.registered_at_str,
+                'last_activity': _format_monotonic(self.last_activity)
+            }
+        return info
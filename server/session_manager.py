@@ -6,10 +6,11 @@ concurrent client sessions in a thread-safe manner.
 
 The SessionManager acts as a centralized registry for all active client
 sessions, providing synchronized access to prevent race conditions when
-multiple threads (listener, handlers, operator) need to access session data.
+multiple threads (event loops, operator) need to access session data.
 
 Key features:
-- Thread-safe add/remove/get operations using locks
+- Thread-safe add/remove operations using a lock (copy-on-write)
+- Lock-free get/list/count operations on an immutable snapshot
 - Session listing with safe snapshots
 - Client count tracking
 - Disconnection marking
@@ -28,19 +29,24 @@ class SessionManager:
     client sessions, ensuring thread safety when multiple threads need
     to add, remove, or query sessions concurrently.
 
-    The internal dictionary is protected by a threading.Lock, which is
-    automatically acquired/released using context managers (with statement).
+    The registry is copy-on-write: add_session/remove_session copy the
+    current dictionary under a threading.Lock, modify the copy and publish
+    it by swapping the reference. A published dictionary is never modified,
+    so readers (every operator command, session listing) just read the
+    current reference without taking the lock - reading one attribute is
+    atomic, and the reader sees a consistent snapshot. Writes (one per
+    connect/disconnect) are rare next to reads.
 
     Attributes:
-        _sessions: Dictionary mapping client_id to ClientSession
-        _lock: Threading lock for synchronizing access
+        _sessions: Dictionary mapping session_id to ClientSession (immutable snapshot)
+        _lock: Threading lock serializing writers
     """
 
     def __init__(self):
         """
         Initialize an empty SessionManager.
 
-        Creates an empty sessions dictionary and a lock for thread safety.
+        Creates an empty sessions snapshot and a lock for writers.
         """
         self._sessions: Dict[str, ClientSession] = {}
         self._lock = threading.Lock()
@@ -49,7 +55,7 @@ class SessionManager:
         """
         Add a new client session to the manager.
 
-        Thread-safe operation that adds a session to the internal dictionary.
+        Thread-safe operation that publishes a new snapshot including the session.
         Uses session_id as the primary key (always unique).
         Multiple sessions with the same client_id are allowed.
 
@@ -61,15 +67,17 @@ class SessionManager:
         """
         with self._lock:
             # Use session_id as key (always unique, no collision possible)
-            self._sessions[session.session_id] = session
+            sessions = dict(self._sessions)
+            sessions[session.session_id] = session
+            self._sessions = sessions
             return True
 
     def remove_session(self, session_id: str) -> Optional[ClientSession]:
         """
         Remove and return a session by session_id.
 
-        Thread-safe operation that removes a session from the dictionary
-        and returns it. If the session_id doesn't exist, returns None.
+        Thread-safe operation that publishes a new snapshot without the
+        session and returns it. If the session_id doesn't exist, returns None.
 
         Args:
             session_id: The session identifier to remove
@@ -79,13 +87,18 @@ class SessionManager:
             None: If session_id doesn't exist
         """
         with self._lock:
-            return self._sessions.pop(session_id, None)
+            if session_id not in self._sessions:
+                return None
+            sessions = dict(self._sessions)
+            session = sessions.pop(session_id)
+            self._sessions = sessions
+            return session
 
     def get_session_by_session_id(self, session_id: str) -> Optional[ClientSession]:
         """
         Get a session by session_id (read-only access).
 
-        Thread-safe operation that retrieves a session without removing it.
+        Lock-free lookup in the current snapshot.
         Returns a reference to the actual session object (not a copy).
 
         Args:
@@ -95,14 +108,13 @@ class SessionManager:
             ClientSession: The session if found
             None: If session_id doesn't exist
         """
-        with self._lock:
-            return self._sessions.get(session_id)
+        return self._sessions.get(session_id)
 
     def list_sessions(self) -> List[dict]:
         """
         Get a snapshot of all active sessions as a list of dicts.
 
-        Thread-safe operation that creates a copy of session information
+        Lock-free: builds session information from the current snapshot,
         suitable for display. Returns dictionaries with formatted strings
         rather than raw session objects.
 
@@ -115,23 +127,19 @@ class SessionManager:
                 - registered_at: str (formatted timestamp)
                 - last_activity: str (formatted timestamp)
         """
-        with self._lock:
-            # Create a snapshot of session info
-            # Use get_info_dict() to get safe dictionary representation
-            return [session.get_info_dict() for session in self._sessions.values()]
+        # Use get_info_dict() to get safe dictionary representation
+        return [session.get_info_dict() for session in self._sessions.values()]
 
     def get_session_count(self) -> int:
         """
         Get the count of active sessions.
 
-        Thread-safe operation that returns the number of sessions
-        currently in the manager.
+        Lock-free: returns the number of sessions in the current snapshot.
 
         Returns:
             int: Number of active sessions
         """
-        with self._lock:
-            return len(self._sessions)
+        return len(self._sessions)
 
     def mark_disconnected(self, session_id: str) -> bool:
         """
@@ -148,22 +156,20 @@ class SessionManager:
             bool: True if session was found and marked
                   False if session_id doesn't exist
         """
-        with self._lock:
-            session = self._sessions.get(session_id)
-            if session:
-                session.connected = False
-                return True
-            return False
+        session = self._sessions.get(session_id)
+        if session:
+            session.mark_disconnected()
+            return True
+        return False
 
     def get_all_session_ids(self) -> List[str]:
         """
         Get a list of all session IDs currently in the manager.
 
-        Thread-safe operation that returns a snapshot of all session_ids.
+        Lock-free: returns the session_ids of the current snapshot.
         Useful for iteration or batch operations.
 
         Returns:
             List[str]: List of session identifiers
         """
-        with self._lock:
-            return list(self._sessions.keys())
+        return list(self._sessions)
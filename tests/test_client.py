@@ -0,0 +1,46 @@
+"""Tests for command execution in the client's persistent shell."""
+
+import os
+import unittest
+from unittest import mock
+
+from client import client
+from common import config
+
+
+@unittest.skipUnless(os.name == 'posix', "the persistent shell is POSIX only")
+class PersistentShellTest(unittest.TestCase):
+
+    def setUp(self):
+        patch = mock.patch.object(config, 'PERSISTENT_SHELL', True)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.addCleanup(client.stop_shell)
+
+    def test_output_and_status_without_markers(self):
+        stdout, stderr, return_code = client.execute_command("echo out; echo err >&2; false")
+        self.assertEqual(stdout, b"out\n")
+        self.assertEqual(stderr, b"err\n")
+        self.assertEqual(return_code, 1)
+
+    def test_output_without_trailing_newline(self):
+        self.assertEqual(client.execute_command("printf abc")[:2], (b"abc", b""))
+
+    def test_state_kept_between_commands(self):
+        client.execute_command("cd / && export C2_TEST_VALUE=42")
+        self.assertEqual(client.execute_command("pwd; echo $C2_TEST_VALUE")[0], b"/\n42\n")
+
+    def test_exit_restarts_shell(self):
+        self.assertEqual(client.execute_command("echo bye; exit 3"), (b"bye\n", b"", 3))
+        self.assertEqual(client.execute_command("echo again"), (b"again\n", b"", 0))
+
+    def test_timeout_kills_shell(self):
+        with mock.patch.object(config, 'COMMAND_TIMEOUT', 0.2):
+            stdout, stderr, return_code = client.execute_command("sleep 5")
+        self.assertEqual((stdout, return_code), (b"", -1))
+        self.assertIn(b"timed out", stderr)
+        self.assertEqual(client.execute_command("echo ok")[0], b"ok\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
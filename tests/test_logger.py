@@ -0,0 +1,56 @@
+"""Tests for the audit log file handler."""
+
+import logging
+import os
+import tempfile
+import unittest
+
+from common import logger
+
+
+class AppendFileHandlerTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'session.log')
+
+    def make_handler(self, max_bytes: int, backup_count: int) -> logger._AppendFileHandler:
+        handler = logger._AppendFileHandler(self.path, max_bytes, backup_count)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.addCleanup(handler.close)
+        return handler
+
+    def log(self, handler: logger._AppendFileHandler, message: str):
+        handler.emit(logging.LogRecord('test', logging.INFO, __file__, 0, message, None, None))
+        handler.drain()
+
+    def read(self, path: str) -> str:
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    def test_appends_records(self):
+        handler = self.make_handler(0, 0)
+        self.log(handler, "first")
+        self.log(handler, "second")
+        self.assertEqual(self.read(self.path), "first\nsecond\n")
+
+    def test_rotates_and_keeps_backup_count(self):
+        handler = self.make_handler(10, 2)
+        for message in ("one-one", "two-two", "three-3", "four-44"):
+            self.log(handler, message)
+        self.assertEqual(self.read(self.path), "four-44\n")
+        self.assertEqual(self.read(self.path + '.1'), "three-3\n")
+        self.assertEqual(self.read(self.path + '.2'), "two-two\n")
+        self.assertFalse(os.path.exists(self.path + '.3'))
+
+    def test_no_backups_truncates(self):
+        handler = self.make_handler(10, 0)
+        self.log(handler, "one-one")
+        self.log(handler, "two-two")
+        self.assertEqual(self.read(self.path), "two-two\n")
+        self.assertFalse(os.path.exists(self.path + '.1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+"""Tests for message framing, payload formats and receive buffering."""
+
+import json
+import socket
+import threading
+import unittest
+import zlib
+from unittest import mock
+
+from common import protocol
+
+
+def frame_bytes(message: dict) -> bytes:
+    header, payload = protocol.encode_frame(message)
+    return bytes(header) + bytes(payload)
+
+
+class EncodeFrameTest(unittest.TestCase):
+
+    def test_header_layout(self):
+        header, payload = protocol.encode_frame({'type': 'command', 'command': 'id'})
+        self.assertEqual(len(header), protocol.HEADER_SIZE)
+        self.assertEqual(int.from_bytes(header[:-1], 'big'), len(payload))
+        self.assertEqual(header[-1], protocol.FORMAT_JSON)
+
+    def test_empty_message_is_zero_length_frame(self):
+        header, payload = protocol.encode_frame({})
+        self.assertEqual(header, bytes(protocol.HEADER_SIZE))
+        self.assertEqual(payload, b'')
+
+    def test_json_round_trip(self):
+        message = {'type': 'result', 'stdout': 'héllo\n', 'return_code': 0}
+        header, payload = protocol.encode_frame(message)
+        self.assertEqual(protocol.decode_payload(header[-1], payload), message)
+
+    def test_json_sends_bytes_as_text(self):
+        header, payload = protocol.encode_frame({'stdout': b'out\xff'})
+        self.assertEqual(protocol.decode_payload(header[-1], payload), {'stdout': 'out�'})
+
+    def test_oversized_message_rejected(self):
+        with mock.patch.object(protocol, '_MAX_MESSAGE_SIZE', 16):
+            with self.assertRaises(ValueError):
+                protocol.encode_frame({'stdout': 'x' * 64})
+
+    def test_unknown_format_tag_rejected(self):
+        with self.assertRaises(ValueError):
+            protocol.decode_payload(0x7F, b'{}')
+
+
+@unittest.skipIf(protocol.msgpack is None, "msgpack is not installed")
+class MessagePackTest(unittest.TestCase):
+
+    def test_round_trip_keeps_bytes(self):
+        message = {'type': 'result', 'stdout': b'\x00\xffraw', 'return_code': 1}
+        with mock.patch.object(protocol, '_USE_MSGPACK', True):
+            header, payload = protocol.encode_frame(message)
+        self.assertEqual(header[-1], protocol.FORMAT_MSGPACK)
+        self.assertEqual(protocol.decode_payload(header[-1], payload), message)
+
+    def test_auto_uses_msgpack_only_for_binary(self):
+        with mock.patch.object(protocol, '_AUTO_MSGPACK', True):
+            self.assertEqual(protocol.encode_payload({'stdout': b'x'})[0], protocol.FORMAT_MSGPACK)
+            self.assertEqual(protocol.encode_payload({'stdout': 'x'})[0], protocol.FORMAT_JSON)
+
+
+class CompressionTest(unittest.TestCase):
+
+    def test_large_payload_compressed(self):
+        message = {'stdout': 'line of output\n' * 1000}
+        header, payload = protocol.encode_frame(message)
+        self.assertTrue(header[-1] & protocol.FLAG_COMPRESSED)
+        self.assertEqual(protocol.decode_payload(header[-1], payload), message)
+
+    def test_small_payload_not_compressed(self):
+        header, _ = protocol.encode_frame({'stdout': 'short'})
+        self.assertFalse(header[-1] & protocol.FLAG_COMPRESSED)
+
+    def test_decompressed_size_limited(self):
+        payload = zlib.compress(json.dumps({'stdout': 'x' * 10000}).encode())
+        tag = protocol.FORMAT_JSON | protocol.FLAG_COMPRESSED
+        with self.assertRaises(ValueError):
+            protocol.decode_payload(tag, payload, max_size=1000)
+
+    def test_invalid_compressed_data_rejected(self):
+        with self.assertRaises(ValueError):
+            protocol.decode_payload(protocol.FORMAT_JSON | protocol.FLAG_COMPRESSED, b'not zlib')
+
+
+class MessageTemplateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.template = protocol.MessageTemplate({'type': 'result'})
+
+    def test_matches_plain_encoding(self):
+        fields = {'command': 'id', 'stdout': b'uid=0\n', 'return_code': 0}
+        self.assertEqual(self.template.encode_frame(fields),
+                         protocol.encode_frame({'type': 'result', **fields}))
+
+    def test_no_variable_fields(self):
+        self.assertEqual(self.template.encode_frame({}), protocol.encode_frame({'type': 'result'}))
+
+    @unittest.skipIf(protocol.msgpack is None, "msgpack is not installed")
+    def test_msgpack_decodes_to_combined_message(self):
+        with mock.patch.object(protocol, '_USE_MSGPACK', True):
+            header, payload = self.template.encode_frame({'return_code': 2})
+        self.assertEqual(protocol.decode_payload(header[-1], payload), {'type': 'result', 'return_code': 2})
+
+
+class ReceiveBufferTest(unittest.TestCase):
+
+    def feed(self, buffer: protocol._ReceiveBuffer, data: bytes):
+        buffer._view[buffer._end:buffer._end + len(data)] = data
+        buffer._end += len(data)
+
+    def test_partial_frame_reports_bytes_needed(self):
+        buffer = protocol._ReceiveBuffer()
+        data = frame_bytes({'command': 'whoami'})
+        self.feed(buffer, data[:3])
+        self.assertEqual(buffer._next_frame(), protocol.HEADER_SIZE)
+        self.feed(buffer, data[3:-1])
+        self.assertEqual(buffer._next_frame(), len(data))
+        self.feed(buffer, data[-1:])
+        format_tag, payload = buffer._next_frame()
+        self.assertEqual(protocol._decode_frame(format_tag, payload, buffer.max_size), {'command': 'whoami'})
+
+    def test_oversized_frame_rejected_from_header(self):
+        buffer = protocol._ReceiveBuffer(max_size=8)
+        with mock.patch('builtins.print'):
+            self.feed(buffer, frame_bytes({'command': 'x' * 32})[:protocol.HEADER_SIZE])
+            self.assertIsNone(buffer._next_frame())
+
+    def test_reserve_grows_for_large_frame(self):
+        buffer = protocol._ReceiveBuffer()
+        buffer._reserve(len(buffer._buffer) + 1)
+        self.assertGreater(len(buffer._buffer), protocol._READER_BUFFER_SIZE)
+
+
+class MessageReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sender, receiver = socket.socketpair()
+        self.addCleanup(self.sender.close)
+        self.addCleanup(receiver.close)
+        receiver.settimeout(5)
+        self.reader = protocol.MessageReader(receiver)
+
+    def test_several_messages_in_one_read(self):
+        self.sender.sendall(frame_bytes({'n': 1}) + frame_bytes({}) + frame_bytes({'n': 2}))
+        self.assertEqual(self.reader.receive_message(), {'n': 1})
+        self.assertEqual(self.reader.receive_message(), {})
+        self.assertEqual(self.reader.receive_message(), {'n': 2})
+
+    def test_message_larger_than_buffer(self):
+        message = {'stdout': bytes(range(256)).hex() * 512}
+        with mock.patch.object(protocol, '_COMPRESSION_THRESHOLD', 0):
+            data = frame_bytes(message)
+        self.assertGreater(len(data), protocol._READER_BUFFER_SIZE)
+        sender = threading.Thread(target=self.sender.sendall, args=(data,))
+        sender.start()
+        self.addCleanup(sender.join)
+        self.assertEqual(self.reader.receive_message(), message)
+
+    def test_oversized_message_returns_none(self):
+        self.reader.max_size = 8
+        self.sender.sendall(frame_bytes({'command': 'x' * 32}))
+        with mock.patch('builtins.print'):
+            self.assertIsNone(self.reader.receive_message())
+
+    def test_malformed_payload_returns_none(self):
+        self.sender.sendall((3 << 8).to_bytes(protocol.HEADER_SIZE, 'big') + b'{{{')
+        self.assertIsNone(self.reader.receive_message())
+
+    def test_closed_connection_returns_none(self):
+        self.sender.sendall(frame_bytes({'n': 1})[:-1])
+        self.sender.close()
+        self.assertIsNone(self.reader.receive_message())
+
+    def test_send_message_round_trip(self):
+        self.assertTrue(protocol.send_message(self.sender, {'type': 'command', 'command': 'id'}))
+        self.assertEqual(self.reader.receive_message(), {'type': 'command', 'command': 'id'})
+
+
+if __name__ == '__main__':
+    unittest.main()
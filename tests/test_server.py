@@ -0,0 +1,103 @@
+"""Tests for the server's listeners and client slot accounting."""
+
+import asyncio
+import socket
+import unittest
+from unittest import mock
+
+from common import protocol
+from server import server
+
+
+class ClientSlotsTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_wait_free_does_not_take_a_slot(self):
+        slots = server._ClientSlots(1)
+        await slots.wait_free()
+        await slots.wait_free()
+        self.assertTrue(slots.try_acquire())
+        self.assertFalse(slots.try_acquire())
+
+    async def test_release_wakes_waiter(self):
+        slots = server._ClientSlots(1)
+        await slots.acquire()
+        waiting = asyncio.ensure_future(slots.acquire())
+        await asyncio.sleep(0)
+        self.assertFalse(waiting.done())
+        slots.release()
+        await asyncio.wait_for(waiting, 1.0)
+        self.assertTrue(slots.full())
+
+
+class ListenerTest(unittest.IsolatedAsyncioTestCase):
+    """MAX_CLIENTS clients spread over several listeners are all served."""
+
+    LIMIT = 2
+
+    async def asyncSetUp(self):
+        self.served = []
+        self.slots = server._ClientSlots(self.LIMIT)
+
+        async def on_connect(connection):
+            self.served.append(connection)
+            await connection.receive_message()  # Until the client closes
+            connection.close()
+
+        patches = [
+            mock.patch.object(server, '_client_slots', self.slots),
+            mock.patch.object(server, '_connection_factory',
+                              lambda *args: lambda: protocol.MessageConnection(on_connect)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        sockets = []
+        for _ in range(2):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(('127.0.0.1', 0))
+            sock.listen(self.LIMIT)
+            sock.setblocking(False)
+            sockets.append(sock)
+        self.ports = [sock.getsockname()[1] for sock in sockets]
+        self.listener = server._Listener(sockets, None, None, mock.Mock())
+        self.writers = []
+
+    async def asyncTearDown(self):
+        for writer in self.writers:
+            writer.close()
+        self.listener.close()
+        await self.listener.wait_closed()
+
+    async def connect(self, port: int):
+        _, writer = await asyncio.open_connection('127.0.0.1', port)
+        self.writers.append(writer)
+        return writer
+
+    async def wait_served(self, count: int):
+        for _ in range(100):
+            if len(self.served) >= count:
+                return
+            await asyncio.sleep(0.01)
+
+    async def test_idle_listener_holds_no_slot(self):
+        for _ in range(self.LIMIT):
+            await self.connect(self.ports[0])
+        await self.wait_served(self.LIMIT)
+        self.assertEqual(len(self.served), self.LIMIT)
+
+    async def test_extra_client_waits_for_a_slot(self):
+        first = await self.connect(self.ports[0])
+        await self.connect(self.ports[1])
+        await self.wait_served(self.LIMIT)
+        await self.connect(self.ports[0])
+        await asyncio.sleep(0.1)
+        self.assertEqual(len(self.served), self.LIMIT)
+
+        first.close()
+        await self.wait_served(self.LIMIT + 1)
+        self.assertEqual(len(self.served), self.LIMIT + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()